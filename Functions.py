@@ -1,66 +1,258 @@
+import threading
+from contextlib import contextmanager
 import pandas as pd
 from typing import Tuple, Dict
-import plotly.express as px
-import plotly.graph_objects as go
-import plotly.io as pio
-from headers import headers
-pio.templates.default = "plotly_dark"
+from cache import LRUCache
+from instrumentation import instrument
+import instrumentation
+import fact_store
 
-def read_portfolio(data: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
-    import yfinance as yf
-    """
-    Parameters:
-        data : pd.DataFrame
-            A pandas DataFrame containing stock portfolio data. It must include a column 
-            named 'symbol' with the stock ticker symbols.
-    """
-    tickers = {}
-    
-    for _, x in data.iterrows():
-        tickers[x.symbol] = yf.Ticker(x.symbol)
+_info_cache = LRUCache(maxsize=1024, ttl=3600, name='infos')
 
-    data['sector'] = data['symbol'].apply(lambda x : tickers.get(x).info.get('sector'))
+PRICE_TARGET_FIELDS = ['current', 'low', 'high', 'mean', 'median']
+RECOMMENDATION_FIELDS = ['strongBuy', 'buy', 'hold', 'sell', 'strongSell']
 
-    data['industry'] = data['symbol'].apply(lambda x : tickers.get(x).info.get('industry'))
+def _fetch_ticker_snapshot(ticker) -> dict:
+    """
+    Reads info, analyst price targets and the latest recommendations summary of a ticker once.
+    """
+    with instrumentation.timed('yfinance_s'):
+        info = ticker.info or {}
+        price_targets = ticker.analyst_price_targets or {}
+        recommendations = ticker.recommendations_summary
+    _info_cache.put(ticker.ticker, info)
+
+    snapshot = {
+        'sector': info.get('sector'),
+        'industry': info.get('industry'),
+    }
+    for field in PRICE_TARGET_FIELDS:
+        snapshot[field] = price_targets.get(field)
+    for field in RECOMMENDATION_FIELDS:
+        snapshot[field] = recommendations.iloc[0][field] if recommendations is not None and len(recommendations) > 0 else None
+    return snapshot
+
+@instrument
+def load_tickers(symbols: list, max_workers: int = 8, timeout: float = 30) -> Tuple[Dict, Dict, Dict]:
+    """
+    Creates a yfinance Ticker for every symbol and fetches its info, price targets and
+    recommendations once, in parallel on a bounded thread pool.
 
-    data['current'] = data['symbol'].apply(lambda x : tickers.get(x).analyst_price_targets.get('current'))
+    Parameters:
+        symbols (list): The stock ticker symbols.
+        max_workers (int): The maximum number of symbols fetched at the same time.
+        timeout (float): Seconds a symbol may take, counted from when its fetch starts.
 
-    data['investment_value'] = data['current'] * data['shares']
+    Returns:
+        Tuple[Dict, Dict, Dict]: The tickers, the fetched snapshots and the error message of
+        every symbol that failed or timed out, all keyed by symbol. A timed-out fetch keeps its
+        worker thread, so when every worker is held by one, the symbols still queued are reported
+        as not started.
+    """
+    import time
+    import yfinance as yf
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-    data['price_target_low'] = data['symbol'].apply(lambda x : tickers.get(x).analyst_price_targets.get('low'))
+    symbols = list(dict.fromkeys(symbols))
+    tickers = {symbol: yf.Ticker(symbol) for symbol in symbols}
+    snapshots, errors = {}, {}
+    workers = max(1, min(max_workers, len(symbols) or 1))
+    started = {}
 
-    data['price_target_high'] = data['symbol'].apply(lambda x : tickers.get(x).analyst_price_targets.get('high'))
+    def fetch(symbol):
+        started[symbol] = time.monotonic()
+        return _fetch_ticker_snapshot(tickers[symbol])
 
-    data['price_target_mean'] = data['symbol'].apply(lambda x : tickers.get(x).analyst_price_targets.get('mean'))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(instrumentation.bind(fetch), symbol): symbol for symbol in symbols}
+        pending, abandoned = set(futures), set()
+        while pending:
+            abandoned = {future for future in abandoned if not future.done()}
+            running = [future for future in pending if futures[future] in started]
+            if not running and len(abandoned) >= workers:
+                for future in pending:
+                    errors[futures[future]] = "Not started, every worker was held by a symbol that timed out"
+                break
+
+            deadline = min((started[futures[future]] + timeout for future in running), default=time.monotonic() + 0.05)
+            done, _ = wait(pending | abandoned, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done & pending:
+                pending.discard(future)
+                try:
+                    snapshots[futures[future]] = future.result()
+                except Exception as e:
+                    errors[futures[future]] = f"An error occurred while loading {futures[future]}: {e}"
+
+            now = time.monotonic()
+            for future in [future for future in pending if futures[future] in started]:
+                if now - started[futures[future]] >= timeout:
+                    pending.discard(future)
+                    abandoned.add(future)
+                    errors[futures[future]] = f"Timed out after {timeout} seconds"
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return tickers, snapshots, errors
+
+@instrument
+def read_portfolio(data: pd.DataFrame, max_workers: int = 8, timeout: float = 30) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Parameters:
+        data : pd.DataFrame
+            A pandas DataFrame containing stock portfolio data. It must include a column 
+            named 'symbol' with the stock ticker symbols.
+        max_workers : int
+            The maximum number of symbols fetched at the same time.
+        timeout : float
+            Seconds to wait for the data of each symbol. Symbols that fail or time out get
+            empty values and their error message is kept in data.attrs['errors'].
+    """
+    columns = ['sector', 'industry', *PRICE_TARGET_FIELDS, *RECOMMENDATION_FIELDS]
 
-    data['price_target_median'] = data['symbol'].apply(lambda x : tickers.get(x).analyst_price_targets.get('median'))
+    tickers, snapshots, errors = load_tickers(data['symbol'].tolist(), max_workers, timeout)
 
-    data['strongBuy'] = data['symbol'].apply(lambda x: tickers.get(x).recommendations_summary.iloc[0]['strongBuy'])
+    snapshots = pd.DataFrame.from_dict(snapshots, orient='index', columns=columns)
+    snapshots = snapshots.reindex(data['symbol'])
+    snapshots.index = data.index
+    snapshots['investment_value'] = snapshots['current'] * data['shares']
+    snapshots = snapshots.rename(columns={field: f'price_target_{field}' for field in PRICE_TARGET_FIELDS if field != 'current'})
 
-    data['buy'] = data['symbol'].apply(lambda x: tickers.get(x).recommendations_summary.iloc[0]['buy'])
+    ordered = ['sector', 'industry', 'current', 'investment_value', 'price_target_low', 'price_target_high',
+               'price_target_mean', 'price_target_median', *RECOMMENDATION_FIELDS]
+    for column in ordered:
+        data[column] = snapshots[column]
+    data.attrs['errors'] = errors
 
-    data['hold'] = data['symbol'].apply(lambda x: tickers.get(x).recommendations_summary.iloc[0]['hold'])
+    return data, tickers
 
-    data['sell'] = data['symbol'].apply(lambda x: tickers.get(x).recommendations_summary.iloc[0]['sell'])
+@instrument
+def get_infos(tickers: dict, max_workers: int = 8) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """
+    Returns the info of every ticker, fetching in parallel only the symbols that are not in the
+    info cache. Infos are cached for an hour and shared with read_portfolio.
 
-    data['strongSell'] = data['symbol'].apply(lambda x: tickers.get(x).recommendations_summary.iloc[0]['strongSell'])
+    Parameters:
+        tickers (dict): yfinance Tickers keyed by symbol.
+        max_workers (int): The number of infos fetched at the same time.
 
-    return data, tickers
+    Returns:
+        Tuple[Dict[str, dict], Dict[str, str]]: The infos and the error message of every symbol that
+        failed, both keyed by symbol.
+    """
+    from concurrent.futures import ThreadPoolExecutor
 
-def get_metrics(tickers: dict, metrics: list) -> pd.DataFrame:
-    import yfinance as yf
-    data = []
+    infos, errors = {}, {}
+    missing = {}
     for symbol, ticker in tickers.items():
-        temp = []
-        temp.append(symbol)
-        for metric in metrics:
-            temp.append(ticker.info[metric])
-        data.append(temp)
-    return pd.DataFrame(data, columns=['symbol', *metrics])
+        info = _info_cache.get(ticker.ticker)
+        if info is None:
+            missing[symbol] = ticker
+        else:
+            infos[symbol] = info
+
+    def fetch(ticker):
+        with instrumentation.timed('yfinance_s'):
+            info = ticker.info or {}
+        _info_cache.put(ticker.ticker, info)
+        return info
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing)))) as executor:
+            futures = {symbol: executor.submit(instrumentation.bind(fetch), ticker) for symbol, ticker in missing.items()}
+            for symbol, future in futures.items():
+                try:
+                    infos[symbol] = future.result()
+                except Exception as e:
+                    errors[symbol] = f"An error occurred while loading {symbol}: {e}"
+    return infos, errors
+
+@instrument
+def get_metrics(tickers: dict, metrics: list, max_workers: int = 8) -> pd.DataFrame:
+    """
+    Returns the metrics of every ticker from its info, with NaN for the metrics a ticker does not report.
+    Infos come from the shared info cache, so later calls for other metrics make no network calls.
+
+    Parameters:
+        tickers (dict): yfinance Tickers keyed by symbol.
+        metrics (list): The info fields, e.g. ['trailingPE', 'priceToBook'].
+        max_workers (int): The number of infos fetched at the same time.
 
+    Returns:
+        pd.DataFrame: The columns symbol and the metrics, one row per ticker. Symbols whose info could
+        not be loaded are listed with their error message in attrs['errors'].
+    """
+    infos, errors = get_infos(tickers, max_workers)
+    data = pd.DataFrame.from_dict({symbol: infos.get(symbol, {}) for symbol in tickers}, orient='index')
+    data = data.reindex(index=list(tickers), columns=metrics)
+    data.index.name = 'symbol'
+    data = data.reset_index()
+    data.attrs['errors'] = errors
+    return data
+
+CIK_INDEX_FILE = "company_tickers_index.json"
+_cik_index = {}
+_cik_index_lock = threading.Lock()
+
+def _build_cik_index(company_tickers: dict) -> dict:
+    """
+    Builds the ticker -> CIK and CIK -> (ticker, title) lookups from the SEC company_tickers.json payload.
+    """
+    columns = {'ticker': [], 'cik': [], 'title': []}
+    for item in company_tickers.values():
+        columns['ticker'].append(item['ticker'].upper())
+        columns['cik'].append(str(item['cik_str']).zfill(10))
+        columns['title'].append(item['title'])
+    return columns
+
+def _load_cik_index() -> dict:
+    """
+    Returns the process-wide CIK index, loading it from the compact on-disk file or rebuilding
+    it from the SEC EDGAR API once the file is older than 30 days.
+    """
+    import os
+    import json
+    from datetime import datetime, timedelta
+    from edgar import get_client
+
+    with _cik_index_lock:
+        now = datetime.now()
+        if _cik_index and now - _cik_index['loaded'] < timedelta(days=30):
+            return _cik_index
+
+        columns, validators = None, None
+        if os.path.exists(CIK_INDEX_FILE):
+            with open(CIK_INDEX_FILE, 'r') as file:
+                columns = json.load(file)
+            loaded = datetime.fromtimestamp(os.path.getmtime(CIK_INDEX_FILE))
+            validators = columns.get('validators')
+
+        if columns is None or now - loaded >= timedelta(days=30):
+            url = f"https://www.sec.gov/files/company_tickers.json"
+            response = get_client().get(url, validators)
+            if response.not_modified:
+                os.utime(CIK_INDEX_FILE)
+            else:
+                columns = _build_cik_index(response.data)
+                columns['validators'] = response.validators
+                with fact_store.atomic_write(CIK_INDEX_FILE) as temporary, open(temporary, 'w') as file:
+                    json.dump(columns, file, separators=(',', ':'))
+            loaded = now
+
+        tickers, ciks = {}, {}
+        for ticker, cik, title in zip(columns['ticker'], columns['cik'], columns['title']):
+            tickers.setdefault(ticker, cik)
+            ciks.setdefault(cik, {'ticker': ticker, 'title': title})
+
+        _cik_index.clear()
+        _cik_index.update({'tickers': tickers, 'ciks': ciks, 'loaded': loaded})
+        return _cik_index
+
+@instrument
 def get_cik_from_symbol(symbol: str) -> str:
     """
     Retrieves the CIK (Central Index Key) for a given stock symbol using the SEC EDGAR API.
+    The lookup is served from an in-memory index that is built once per process.
 
     Parameters:
         symbol (str): The stock ticker symbol.
@@ -69,292 +261,537 @@ def get_cik_from_symbol(symbol: str) -> str:
         str: The corresponding CIK or an error message if not found.
     """
     import requests
-    import os
-    import json
-    from datetime import datetime, timedelta
     try:
-        cache_file = "company_tickers.json"
-        symbol = symbol.upper()
-
-        if os.path.exists(cache_file):
-            file_mod_time = datetime.fromtimestamp(os.path.getmtime(cache_file))
-            if datetime.now() - file_mod_time < timedelta(days=30):
-                with open(cache_file, 'r') as file:
-                    data = json.load(file)
-                for item in data.values():
-                    if item['ticker'].upper() == symbol:
-                        return str(item['cik_str']).zfill(10)
-                    
-        url = f"https://www.sec.gov/files/company_tickers.json"
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        with open(cache_file, 'w') as file:
-            json.dump(data, file, indent=4)
-
-        for item in data.values():
-            if item['ticker'].upper() == symbol:
-                return str(item['cik_str']).zfill(10)
-
-        return "CIK not found for the provided symbol."
+        cik = _load_cik_index()['tickers'].get(symbol.upper())
+        if cik is None:
+            return "CIK not found for the provided symbol."
+        return cik
 
     except requests.RequestException as e:
         return f"An error occurred while accessing the SEC EDGAR API: {e}"
 
-def get_company_submission(cik: str) -> dict:
+@instrument
+def resolve_many(symbols: list) -> Dict[str, str]:
+    """
+    Resolves the CIK of many stock symbols with a single index load.
+
+    Parameters:
+        symbols (list): The stock ticker symbols.
+
+    Returns:
+        Dict[str, str]: The CIK of every symbol, or None for symbols that are not found.
+    """
+    tickers = _load_cik_index()['tickers']
+    return {symbol: tickers.get(symbol.upper()) for symbol in symbols}
+
+@instrument
+def get_company_from_cik(cik: str) -> dict:
+    """
+    Retrieves the primary ticker and the title of the company registered under a CIK.
+
+    Parameters:
+        cik (str): The CIK of the company.
+
+    Returns:
+        dict: The 'ticker' and 'title' of the company, or None if the CIK is not found.
+    """
+    return _load_cik_index()['ciks'].get(str(cik).zfill(10))
+
+def _load_cached_json(file_path: str, url: str, max_age_days: int) -> dict:
+    """
+    Returns the JSON document cached at file_path, downloading it again once it is older than
+    max_age_days. The ETag and Last-Modified of the download are kept next to the file, so an
+    unchanged document is answered with 304 Not Modified and only the file time is refreshed.
+    """
+    import os
+    import json
+    from datetime import datetime, timedelta
+    from edgar import get_client
+
+    meta_path = f"{file_path}.meta"
+    validators = None
+    if os.path.exists(file_path):
+        file_mod_time = datetime.fromtimestamp(os.path.getmtime(file_path))
+        if datetime.now() - file_mod_time < timedelta(days=max_age_days):
+            with open(file_path, 'r') as file:
+                return json.load(file)
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as file:
+                validators = json.load(file)
+
+    response = get_client().get(url, validators)
+    if response.not_modified:
+        os.utime(file_path)
+        with open(file_path, 'r') as file:
+            return json.load(file)
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with fact_store.atomic_write(file_path) as temporary, open(temporary, 'w') as file:
+        json.dump(response.data, file, indent=4)
+    with fact_store.atomic_write(meta_path) as temporary, open(temporary, 'w') as file:
+        json.dump(response.validators, file)
+
+    return response.data
+
+@instrument
+def get_company_submission(cik: str, max_age_days: int = 7) -> dict:
     """
     Retrieves all submissions filed by a company from the SEC EDGAR API.
     Saves the data to a JSON file and updates it if older than 7 days.
 
     Parameters:
         cik (str): The CIK of the company.
+        max_age_days (int): How many days the saved file is used before it is revalidated.
 
     Returns:
         dict: A dictionary containing all submissions or an error message if retrieval fails.
     """
     import requests
-    import os
-    import json
-    from datetime import datetime, timedelta
     try:
         file_path = f"Submssions/CIK{cik}_submissions.json"
-        # Check if the file exists and was updated less than 7 days ago
-        if os.path.exists(file_path):
-            file_mod_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-            if datetime.now() - file_mod_time < timedelta(days=7):
-                with open(file_path, 'r') as file:
-                    return json.load(file)
-
         url = f"https://data.sec.gov/submissions/CIK{cik}.json"
-
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-
-        submissions = response.json()
-
-        with open(file_path, 'w') as file:
-            json.dump(submissions, file, indent=4)
-
-        return submissions
+        return _load_cached_json(file_path, url, max_age_days)
 
     except requests.RequestException as e:
         return {"error": f"An error occurred while accessing the SEC EDGAR API: {e}"}
     except Exception as e:
         return {"error": f"An unexpected error occurred: {e}"}
 
+_company_facts_cache = LRUCache(maxsize=64, name='company_facts')
+_fact_cache = LRUCache(maxsize=2048, name='facts')
+
+def _cached_company_facts(cik: str) -> "fact_store.CompanyFacts":
+    """
+    Returns the CompanyFacts view of a company, reusing the one built for the current version of the store.
+    """
+    import os
+    key = (os.path.abspath(fact_store.STORE_ROOT), str(cik).zfill(10), fact_store.store_version(cik))
+    company_facts = _company_facts_cache.get(key)
+    if company_facts is None:
+        company_facts = fact_store.CompanyFacts(cik)
+        _company_facts_cache.put(key, company_facts)
+    return company_facts
+
+def cache_info() -> Dict[str, dict]:
+    """
+    Returns the hits, misses and size of the in-process caches of company facts, extracted facts and
+    ticker infos.
+    """
+    return {'company_facts': _company_facts_cache.info(), 'facts': _fact_cache.info(), 'infos': _info_cache.info()}
+
+def clear_caches() -> None:
+    _company_facts_cache.clear()
+    _fact_cache.clear()
+    _info_cache.clear()
+
+@instrument
 def get_company_facts(cik: str, symbol: str) -> dict:
     """
-    Retrieves company facts from the SEC EDGAR API and saves it to a JSON file named after the symbol.
-    If the file exists and was updated less than a day ago, return the data from the file.
+    Retrieves company facts from the SEC EDGAR API and saves them to the columnar fact store
+    (companiesFacts/CIK{cik}/). If the company was updated less than 10 days ago, the stored
+    facts are returned. JSON caches named after the symbol are migrated to the store once.
 
     Parameters:
         cik (str): The CIK of the company.
         symbol (str): The stock ticker symbol.
 
     Returns:
-        dict: The company facts or an error message if retrieval fails.
+        dict: The company facts as a CompanyFacts view or an error message if retrieval fails.
     """
     import requests
     import os
-    import json
     from datetime import datetime, timedelta
+    from edgar import get_client
     try:
-        file_path = f"companiesFacts/{symbol}.json"
-        if os.path.exists(file_path):
+        if os.path.exists(f"{fact_store.STORE_ROOT}/{symbol}.json"):
+            fact_store.migrate_json_cache()
+
+        validators = None
+        if fact_store.has_company(cik):
+            file_path = fact_store.facts_path(cik)
             file_mod_time = datetime.fromtimestamp(os.path.getmtime(file_path))
             if datetime.now() - file_mod_time < timedelta(days=10):
-                with open(file_path, 'r') as file:
-                    return json.load(file)
+                return _cached_company_facts(cik)
+            validators = fact_store.read_meta(cik).get('validators')
 
         url = f"https://data.sec.gov/api/xbrl/companyfacts/CIK{cik}.json"
+        response = get_client().get(url, validators)
+        if response.not_modified:
+            os.utime(fact_store.facts_path(cik))
+        else:
+            fact_store.write_company_facts(response.data, response.validators)
 
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-
-        company_facts = response.json()
-
-        with open(file_path, 'w') as file:
-            json.dump(company_facts, file, indent=4)
-
-        return company_facts
+        return _cached_company_facts(cik)
 
     except requests.RequestException as e:
         return {"error": f"An error occurred while accessing the SEC EDGAR API: {e}"}
     except Exception as e:
         return {"error": f"An unexpected error occurred: {e}"}
 
-def get_fact(company_facts: dict, fact: str, annual_form: str = "10-K", quarter_form: str = "10-Q") -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """
-    Extracts and organizes quarterly and annual revenue data from a company's financial facts.
+# Days after which a filing whose values never reached the companyfacts API is recorded anyway
+FILING_GRACE_DAYS = 7
+_daily_index_cache = LRUCache(maxsize=128, name='daily_index')
 
-    Parameters:
-        company_facts (dict): A dictionary containing financial data for a company, structured
-                              as per the SEC EDGAR API's `companyfacts` endpoint.
+def _daily_index_filings(day) -> list:
     """
-    company_facts_df = None
-    type_of_fact = list(company_facts['facts']['us-gaap'][fact]['units'].keys())[0]
-    company_facts_df = pd.DataFrame(company_facts['facts']['us-gaap'][fact]['units'][type_of_fact])
-    per_share = False
-    if type_of_fact == 'USD/shares':
-        per_share = True
-    
-    company_facts_df['start'] = pd.to_datetime(company_facts_df['start'])
-    company_facts_df['end'] = pd.to_datetime(company_facts_df['end'])
-    company_facts_df['diff'] = company_facts_df['end'] - company_facts_df['start']
-
-    annual_facts = company_facts_df[company_facts_df['form'] == annual_form]
-    annual_facts = annual_facts.sort_values(by=['end', 'filed'], ascending=[True, False])
+    Returns the (cik, form, filed, accession) of every filing in EDGAR's daily master index of a day,
+    or None when there is no index for that day yet, or none at all, e.g. on a holiday. Published
+    indexes never change and are kept in memory.
+    """
+    import requests
+    from edgar import get_client
 
-    quarter_facts = company_facts_df[company_facts_df['form'] == quarter_form]
-    quarter_facts = quarter_facts.sort_values(by=['end', 'filed'], ascending=[True, False])
+    filings = _daily_index_cache.get(day)
+    if filings is not None:
+        return filings
 
-    annual_data = {
-        'Date': [],
-        fact: []
-    }
-    quarter_data = {
-        'Date': [],
-        fact: []
-    }
+    quarter = (day.month - 1) // 3 + 1
+    url = f"https://www.sec.gov/Archives/edgar/daily-index/{day.year}/QTR{quarter}/master.{day:%Y%m%d}.idx"
+    try:
+        content = get_client().get(url, text=True).data
+    except requests.HTTPError as e:
+        # Indexes are only published for business days, after the day ends
+        if e.response is None or e.response.status_code not in (403, 404):
+            raise
+        return None
+
+    filings = []
+    for line in content.splitlines():
+        fields = line.split('|')
+        if len(fields) != 5 or not fields[0].isdigit():
+            continue
+        cik, _, form, filed, file_name = fields
+        filed = filed.replace('-', '')
+        filings.append((cik.zfill(10), form, f"{filed[:4]}-{filed[4:6]}-{filed[6:8]}",
+                        file_name.rsplit('/', 1)[-1].removesuffix('.txt')))
+    _daily_index_cache.put(day, filings)
+    return filings
+
+def _filers_since(since, forms: tuple) -> Tuple[dict, object]:
+    """
+    Returns the latest filing of one of the forms of every company that filed since a date, read from
+    one daily index per business day, and the last day an index was published for.
+    """
+    from datetime import date, timedelta
+
+    filers, indexed = {}, None
+    day = since
+    while day <= date.today():
+        filings = _daily_index_filings(day) if day.weekday() < 5 else None
+        if filings is not None:
+            indexed = day
+            for cik, form, filed, accession in filings:
+                if form in forms and (cik not in filers or filed >= filers[cik]['filed']):
+                    filers[cik] = {'accession': accession, 'form': form, 'filed': filed}
+        day += timedelta(days=1)
+    return filers, indexed
+
+@instrument
+def refresh_company_facts(ciks: list, forms: tuple = fact_store.FILING_FORMS, max_workers: int = 8) -> pd.DataFrame:
+    """
+    Brings the fact store up to date, downloading and merging company facts only for companies that
+    filed one of the forms since their last refresh. Companies without new filings keep their stored
+    facts, which count as fresh again for get_company_facts.
 
-    year_idx = {}
+    New filings of companies already in the manifest are found in EDGAR's daily master index, one
+    request per business day since the oldest of their refreshes, however many companies there are.
+    Companies missing from the manifest, or all of them when there are fewer companies than days to
+    read, are checked one by one against their submissions, one request per company. Every company
+    with a new filing then costs one companyfacts request.
 
-    annual_obtained = set()
-    quarter_obtained = set()
-    counter = 0
-    for _, row in annual_facts.iterrows():
-        if row['end'] in annual_obtained:
-            continue
-        elif row['diff'].days >= 363:
-            annual_data['Date'].append(row['end'])
-            annual_data[fact].append(row['val'])
-            annual_obtained.add(row['end'])
-            year_idx[row['end'].year] = counter
-            counter += 1
+    A new filing is only recorded in the manifest once the stored facts hold its values. SEC can list
+    a filing before its facts reach the companyfacts API, such companies are 'pending' and are tried
+    again on the next refresh. Filings still missing after FILING_GRACE_DAYS, e.g. amendments without
+    financial data, are recorded anyway.
 
+    Parameters:
+        ciks (list): The CIKs of the companies.
+        forms (tuple): The forms that carry new financial facts.
+        max_workers (int): The number of companies checked at the same time.
 
-    for _, row in quarter_facts.iterrows():
-        if row['end'] in quarter_obtained:
-            continue
-        elif row['diff'].days >= 89 and row['diff'].days <= 91:
-            quarter_data['Date'].append(row['end'])
-            quarter_data[fact].append(row['val'])
-            quarter_obtained.add(row['end'])
+    Returns:
+        pd.DataFrame: One row per CIK with its status ('unchanged', 'updated', 'pending' or 'error'),
+        the latest accession number, the number of new values and the error message if any.
+    """
+    import os
+    import requests
+    from datetime import date, datetime, timedelta
+    from concurrent.futures import ThreadPoolExecutor
+    from edgar import get_client
+
+    manifest = fact_store.read_manifest()
+    manifest_lock = threading.Lock()
+
+    ciks = [str(cik).zfill(10) for cik in ciks]
+    tracked = {cik for cik in ciks if manifest.get(cik, {}).get('refreshed') and fact_store.has_company(cik)}
+    filers, indexed = None, None
+    if tracked:
+        since = min(date.fromisoformat(manifest[cik]['refreshed'][:10]) for cik in tracked)
+        # Reading the indexes only pays off when there are fewer business days than companies
+        if (date.today() - since).days * 5 / 7 < len(tracked):
+            try:
+                filers, indexed = _filers_since(since, forms)
+            except requests.RequestException:
+                filers = None
+
+    def refresh(cik):
+        try:
+            known = manifest.get(cik, {}).get('accession')
+            if filers is not None and cik in tracked:
+                latest = filers.get(cik)
+                if latest is None or known == latest['accession']:
+                    os.utime(fact_store.facts_path(cik))
+                    # Checked up to the last published index, the days after it are read again next time
+                    if indexed is not None and indexed.isoformat() > manifest[cik]['refreshed'][:10]:
+                        with manifest_lock:
+                            manifest[cik] = {**manifest[cik], 'refreshed': indexed.isoformat()}
+                    return {'cik': cik, 'status': 'unchanged', 'accession': known, 'new_values': 0}
+            else:
+                submissions = get_company_submission(cik, max_age_days=0)
+                if 'error' in submissions:
+                    return {'cik': cik, 'status': 'error', 'error': submissions['error']}
+                latest = fact_store.latest_filing(submissions, forms)
+
+                if latest is not None and known == latest['accession'] and fact_store.has_company(cik):
+                    os.utime(fact_store.facts_path(cik))
+                    with manifest_lock:
+                        manifest[cik] = {**manifest[cik], 'refreshed': datetime.now().isoformat(timespec='seconds')}
+                    return {'cik': cik, 'status': 'unchanged', 'accession': known, 'new_values': 0}
+
+            validators = fact_store.read_meta(cik).get('validators') if fact_store.has_company(cik) else None
+            url = f"https://data.sec.gov/api/xbrl/companyfacts/CIK{cik}.json"
+            response = get_client().get(url, validators)
+            new_values = 0
+            if not response.not_modified:
+                new_values = fact_store.merge_company_facts(response.data, response.validators)
+
+            stored = (latest is None or fact_store.has_accession(cik, latest['accession'])
+                      or date.fromisoformat(latest['filed']) < date.today() - timedelta(days=FILING_GRACE_DAYS))
+            if not stored:
+                # The previous manifest entry is kept, so the filing is looked for again next time
+                return {'cik': cik, 'status': 'pending', 'accession': latest['accession'], 'new_values': new_values}
+
+            if response.not_modified:
+                os.utime(fact_store.facts_path(cik))
+            with manifest_lock:
+                manifest[cik] = {**(latest or {}), 'refreshed': datetime.now().isoformat(timespec='seconds')}
+            return {'cik': cik, 'status': 'updated', 'accession': latest and latest['accession'], 'new_values': new_values}
+
+        except requests.RequestException as e:
+            return {'cik': cik, 'status': 'error', 'error': f"An error occurred while accessing the SEC EDGAR API: {e}"}
+        except Exception as e:
+            return {'cik': cik, 'status': 'error', 'error': f"An unexpected error occurred: {e}"}
 
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(instrumentation.bind(refresh), ciks))
+    fact_store.write_manifest(manifest)
 
-    annual_data = pd.DataFrame(annual_data)
-    annual_data['Date'] = pd.to_datetime(annual_data['Date'])
-    annual_data = annual_data.set_index('Date')
+    return pd.DataFrame(results, columns=['cik', 'status', 'accession', 'new_values', 'error'])
 
-    quarter_data = pd.DataFrame(quarter_data, columns=['Date', fact])
-    quarter_data['Date'] = pd.to_datetime(quarter_data['Date'])
-    quarter_data = quarter_data.set_index('Date')
+def _fact_records(company_facts: dict, fact: str) -> Tuple[pd.DataFrame, str]:
+    """
+    Returns the values of a us-gaap fact in its first reported unit, reading only that
+    concept when the facts come from the fact store.
+    """
+    if isinstance(company_facts, fact_store.CompanyFacts):
+        return company_facts.concept_frame(fact)
+    type_of_fact = list(company_facts['facts']['us-gaap'][fact]['units'].keys())[0]
+    return pd.DataFrame(company_facts['facts']['us-gaap'][fact]['units'][type_of_fact]), type_of_fact
 
-    if len(quarter_data) > 0:
-        sum, counter = 0, 0
-        prev = quarter_data.index[0].year
-        for row in quarter_data.index:
-            if row.year == prev:
-                counter += 1
-                sum += quarter_data.loc[row][fact]
-            else:
-                prev = row.year
-                sum, counter = quarter_data.loc[row][fact], 1
-            if counter == 3:
-                if len(annual_data[annual_data.index >= row]) > 0:
-                    value = annual_data[annual_data.index >= row].iloc[0][fact]
-                    time = annual_data[annual_data.index >= row].iloc[0].name
-                    quarter_data.loc[time] = value - sum
-                sum, counter = 0, 0
-
-        quarter_data = quarter_data.sort_index()
-    
-    if not per_share:
-        quarter_data[fact] = quarter_data[fact].apply(lambda x: f"{x:.0f}")
-        annual_data[fact] = annual_data[fact].apply(lambda x: f"{x:.0f}")
+def _derive_fourth_quarters(quarter_data: pd.DataFrame, annual_data: pd.DataFrame, fact: str) -> pd.DataFrame:
+    """
+    Adds the quarter that is only reported inside the annual filing, as the annual value minus
+    the three quarters before it. Quarters are counted in runs of the same calendar year and
+    every third quarter of a run is matched with the first annual period ending on or after it.
+    """
+    import numpy as np
 
-    return (quarter_data, annual_data)
+    values = quarter_data[fact].to_numpy()
+    years = quarter_data.index.year.to_numpy()
+    positions = np.arange(len(years))
+    run_starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+    position_in_run = positions - run_starts[np.searchsorted(run_starts, positions, side='right') - 1]
+
+    third = positions[position_in_run % 3 == 2]
+    if len(third) == 0 or len(annual_data) == 0:
+        return quarter_data
+    sums = values[third - 2] + values[third - 1] + values[third]
+
+    following = np.searchsorted(annual_data.index.to_numpy(), quarter_data.index.to_numpy()[third], side='left')
+    matched = following < len(annual_data)
+    if not matched.any():
+        return quarter_data
+    times = annual_data.index[following[matched]]
+
+    # The derived value replaces a reported quarter that may still be summed later, which only
+    # the row by row derivation reproduces.
+    if times.isin(quarter_data.index).any():
+        return _derive_fourth_quarters_sequential(quarter_data, annual_data, fact)
+
+    fourth = pd.DataFrame({fact: annual_data[fact].to_numpy()[following[matched]] - sums[matched]}, index=times)
+    fourth = fourth[~fourth.index.duplicated(keep='last')]
+    return pd.concat([quarter_data, fourth]).sort_index()
+
+def _derive_fourth_quarters_sequential(quarter_data: pd.DataFrame, annual_data: pd.DataFrame, fact: str) -> pd.DataFrame:
+    sum, counter = 0, 0
+    prev = quarter_data.index[0].year
+    for row in quarter_data.index:
+        if row.year == prev:
+            counter += 1
+            sum += quarter_data.loc[row][fact]
+        else:
+            prev = row.year
+            sum, counter = quarter_data.loc[row][fact], 1
+        if counter == 3:
+            following = annual_data[annual_data.index >= row]
+            if len(following) > 0:
+                quarter_data.loc[following.iloc[0].name] = following.iloc[0][fact] - sum
+            sum, counter = 0, 0
+
+    return quarter_data.sort_index()
+
+def _first_per_period(facts: pd.DataFrame, form: str, min_days: int = None, max_days: int = None) -> pd.DataFrame:
+    """
+    Keeps the most recently filed value of every period end reported on a form, optionally only
+    for periods lasting between min_days and max_days.
+    """
+    facts = facts[facts['form'] == form]
+    facts = facts.sort_values(by=['end', 'filed'], ascending=[True, False])
+    if min_days is not None:
+        days = (facts['end'] - facts['start']).dt.days
+        mask = days >= min_days
+        if max_days is not None:
+            mask &= days <= max_days
+        facts = facts[mask]
+    return facts.drop_duplicates(subset='end', keep='first')
+
+def _period_frame(facts: pd.DataFrame, fact: str) -> pd.DataFrame:
+    if len(facts) == 0:
+        data = pd.DataFrame({'Date': [], fact: []})
+    else:
+        data = pd.DataFrame({'Date': facts['end'].values, fact: facts['val'].values})
+    data['Date'] = pd.to_datetime(data['Date'])
+    return data.set_index('Date')
 
-def get_special_fact(company_facts: dict, fact: str, annual_form: str = "10-K", quarter_form: str = "10-Q" ) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    company_facts_df = None
-    type_of_fact = list(company_facts['facts']['us-gaap'][fact]['units'].keys())[0]
-    company_facts_df = pd.DataFrame(company_facts['facts']['us-gaap'][fact]['units'][type_of_fact])
-    per_share = False
-    if type_of_fact == 'USD/shares':
-        per_share = True
+def _extract_fact(company_facts: dict, fact: str, annual_form: str, quarter_form: str, filter_duration: bool, formatted: bool) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Builds the quarterly and annual series of a fact. With filter_duration, annual values must span at
+    least 363 days and quarterly values 89 to 91 days. Typed results for facts read from the fact store
+    are kept in an LRU cache, errors included, and formatted on the way out.
+    """
+    import os
 
+    if not isinstance(company_facts, fact_store.CompanyFacts):
+        quarter_data, annual_data = _compute_fact(company_facts, fact, annual_form, quarter_form, filter_duration)
+    else:
+        # The store version changes whenever the company is written again, which retires older entries
+        key = (os.path.abspath(company_facts.root), company_facts.cik, company_facts.version,
+               fact, annual_form, quarter_form, filter_duration)
+        cached = _fact_cache.get(key)
+        if cached is None:
+            try:
+                cached = _compute_fact(company_facts, fact, annual_form, quarter_form, filter_duration)
+            except Exception as e:
+                # Only the type and arguments are kept, a cached instance would collect the traceback of every raise
+                cached = (type(e), e.args)
+            _fact_cache.put(key, cached)
+
+        if isinstance(cached[0], type):
+            error_type, args = cached
+            raise error_type(*args)
+        quarter_data, annual_data = cached
+
+    if formatted:
+        return (format_facts(quarter_data), format_facts(annual_data))
+    return (quarter_data.copy(), annual_data.copy())
+
+def _compute_fact(company_facts: dict, fact: str, annual_form: str, quarter_form: str, filter_duration: bool) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    company_facts_df, type_of_fact = _fact_records(company_facts, fact)
+
+    if filter_duration:
+        company_facts_df['start'] = pd.to_datetime(company_facts_df['start'])
     company_facts_df['end'] = pd.to_datetime(company_facts_df['end'])
 
-    annual_facts = company_facts_df[company_facts_df['form'] == annual_form]
-    annual_facts = annual_facts.sort_values(by=['end', 'filed'], ascending=[True, False])
-
-    quarter_facts = company_facts_df[company_facts_df['form'] == quarter_form]
-    quarter_facts = quarter_facts.sort_values(by=['end', 'filed'], ascending=[True, False])
+    if filter_duration:
+        annual_facts = _first_per_period(company_facts_df, annual_form, 363)
+        quarter_facts = _first_per_period(company_facts_df, quarter_form, 89, 91)
+    else:
+        annual_facts = _first_per_period(company_facts_df, annual_form)
+        quarter_facts = _first_per_period(company_facts_df, quarter_form)
 
-    annual_data = {
-        'Date': [],
-        fact: []
-    }
-    quarter_data = {
-        'Date': [],
-        fact: []
-    }
-    year_idx = {}
+    annual_data = _period_frame(annual_facts, fact)
+    quarter_data = _period_frame(quarter_facts, fact)
 
-    annual_obtained = set()
-    quarter_obtained = set()
-    counter = 0
-    for _, row in annual_facts.iterrows():
-        if row['end'] in annual_obtained:
-            continue
-        annual_data['Date'].append(row['end'])
-        annual_data[fact].append(row['val'])
-        annual_obtained.add(row['end'])
-        year_idx[row['end'].year] = counter
-        counter += 1
+    if len(quarter_data) > 0:
+        quarter_data = _derive_fourth_quarters(quarter_data, annual_data, fact)
 
+    units = {fact: type_of_fact} if type_of_fact != 'USD' else {}
+    quarter_data.attrs['units'] = units
+    annual_data.attrs['units'] = dict(units)
+    return (quarter_data, annual_data)
 
-    for _, row in quarter_facts.iterrows():
-        if row['end'] in quarter_obtained:
-            continue
-        quarter_data['Date'].append(row['end'])
-        quarter_data[fact].append(row['val'])
-        quarter_obtained.add(row['end'])
+@instrument
+def format_facts(data: pd.DataFrame, units: dict = None) -> pd.DataFrame:
+    """
+    Formats typed facts for display, as get_fact, get_special_fact and get_all_facts do by default:
+    amounts become strings without decimals and per-share amounts stay numbers.
 
+    Parameters:
+        data (pd.DataFrame): Facts returned with formatted=False.
+        units (dict): The unit of every column not in USD, e.g. {'EarningsPerShareDiluted': 'USD/shares'}.
+                      Defaults to data.attrs['units'], which get_fact and get_all_facts set.
 
-    annual_data = pd.DataFrame(annual_data)
-    annual_data['Date'] = pd.to_datetime(annual_data['Date'])
-    annual_data = annual_data.set_index('Date')
+    Returns:
+        pd.DataFrame: A formatted copy of data. Columns without a unit are USD amounts. pandas drops
+        attrs when frames with different attrs are combined, so when data has no units at all,
+        columns holding values with decimals are taken for per-share amounts and left as numbers.
+    """
+    import numpy as np
 
-    quarter_data = pd.DataFrame(quarter_data, columns=['Date', fact])
-    quarter_data['Date'] = pd.to_datetime(quarter_data['Date'])
-    quarter_data = quarter_data.set_index('Date')
+    known = units is not None or 'units' in data.attrs
+    units = units if units is not None else data.attrs.get('units', {})
+    # pandas deep copies attrs into every derived Series, so the columns are formatted without them
+    plain = data.copy(deep=False)
+    plain.attrs = {}
+
+    def per_share(column, values):
+        if units.get(column) == 'USD/shares':
+            return True
+        if known or not pd.api.types.is_float_dtype(values):
+            return False
+        values = values.to_numpy(dtype='float64', na_value=np.nan)
+        return bool((np.nan_to_num(values) % 1 != 0).any())
+
+    columns = {column: values if per_share(column, values) else values.map(lambda x: f"{x:.0f}", na_action='ignore')
+               for column, values in plain.items()}
+    formatted = pd.DataFrame(columns, index=data.index)
+    formatted.attrs = dict(data.attrs)
+    return formatted
+
+@instrument
+def get_fact(company_facts: dict, fact: str, annual_form: str = "10-K", quarter_form: str = "10-Q", formatted: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Extracts and organizes quarterly and annual revenue data from a company's financial facts.
+    Only annual periods of at least 363 days and quarters of 89 to 91 days are kept.
 
-    if len(quarter_data) > 0:
-        sum, counter = 0, 0
-        prev = quarter_data.index[0].year
-        for row in quarter_data.index:
-            if row.year == prev:
-                counter += 1
-                sum += quarter_data.loc[row][fact]
-            else:
-                prev = row.year
-                sum, counter = quarter_data.loc[row][fact], 1
-            if counter == 3:
-                if len(annual_data[annual_data.index >= row]) > 0:
-                    value = annual_data[annual_data.index >= row].iloc[0][fact]
-                    time = annual_data[annual_data.index >= row].iloc[0].name
-                    quarter_data.loc[time] = value - sum
-                sum, counter = 0, 0
-
-        quarter_data = quarter_data.sort_index()
-    
-    if not per_share:
-        quarter_data[fact] = quarter_data[fact].apply(lambda x: f"{x:.0f}")
-        annual_data[fact] = annual_data[fact].apply(lambda x: f"{x:.0f}")
+    Parameters:
+        company_facts (dict): A dictionary containing financial data for a company, structured
+                              as per the SEC EDGAR API's `companyfacts` endpoint.
+        formatted (bool): Formats values other than per-share amounts as strings without decimals.
+                          When False the int64 or float64 values are returned, and format_facts
+                          formats them for display later.
+    """
+    return _extract_fact(company_facts, fact, annual_form, quarter_form, True, formatted)
 
-    return (quarter_data, annual_data)
+@instrument
+def get_special_fact(company_facts: dict, fact: str, annual_form: str = "10-K", quarter_form: str = "10-Q", formatted: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Same as get_fact without the period length filter, for facts such as balance sheet items
+    that are reported at a point in time.
+    """
+    return _extract_fact(company_facts, fact, annual_form, quarter_form, False, formatted)
 
+@instrument
 def get_recent_fact_from_symbol(symbol: str, fact: str, annual: bool = True, annual_form: str = "10-K", quarter_form: str = "10-Q" ) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Retrieves most reacet quarter or annual data for a specific financial fact based on a stock symbol.
@@ -370,14 +807,104 @@ def get_recent_fact_from_symbol(symbol: str, fact: str, annual: bool = True, ann
     else:
         return quarter_data[fact].iloc[-1]
 
-def get_all_facts(company_facts: dict) -> Tuple[pd.DataFrame, pd.DataFrame, list]:
+def _us_gaap_facts(company_facts: dict, selected: list = None) -> Tuple[pd.DataFrame, dict]:
+    """
+    Returns the us-gaap values of a company as one long frame, with the concepts and their units.
+    All concepts are returned unless selected lists the ones wanted.
+    """
+    if isinstance(company_facts, fact_store.CompanyFacts):
+        concepts = company_facts.meta['concepts']['us-gaap']
+        if selected is not None:
+            concepts = {concept: concepts[concept] for concept in selected if concept in concepts}
+        facts = fact_store.read_facts(company_facts.cik, selected, taxonomy='us-gaap', root=company_facts.root)
+        return facts, concepts
+    us_gaap = company_facts['facts']['us-gaap']
+    if selected is not None:
+        us_gaap = {concept: us_gaap[concept] for concept in selected if concept in us_gaap}
+    facts, concepts = fact_store.flatten_company_facts({'facts': {'us-gaap': us_gaap}})
+    return facts, concepts.get('us-gaap', {})
+
+def _derive_fourth_quarters_bulk(quarter_facts: pd.DataFrame, annual_facts: pd.DataFrame) -> Tuple[pd.DataFrame, list]:
+    """
+    Same derivation as _derive_fourth_quarters for the quarters of many concepts at once. Both frames
+    hold concept, end and val sorted by concept and end.
+
+    Returns:
+        Tuple[pd.DataFrame, list]: The derived quarters, and the concepts whose fiscal year ends on a
+        reported quarter end, which must be derived one concept at a time.
+    """
+    import numpy as np
+
+    concepts = quarter_facts['concept'].to_numpy()
+    years = quarter_facts['end'].dt.year.to_numpy()
+    values = quarter_facts['val'].to_numpy()
+    positions = np.arange(len(years))
+    run_starts = np.flatnonzero(np.r_[True, (years[1:] != years[:-1]) | (concepts[1:] != concepts[:-1])])
+    position_in_run = positions - run_starts[np.searchsorted(run_starts, positions, side='right') - 1]
+
+    third = positions[position_in_run % 3 == 2]
+    triggers = pd.DataFrame({
+        'concept': quarter_facts['concept'].iloc[third].to_numpy(),
+        'Date': quarter_facts['end'].to_numpy()[third],
+        'sum': values[third - 2] + values[third - 1] + values[third],
+    })
+    annual = pd.DataFrame({
+        'concept': annual_facts['concept'].to_numpy(),
+        'time': annual_facts['end'].to_numpy(),
+        'annual': annual_facts['val'].to_numpy(),
+    })
+    triggers['concept'] = triggers['concept'].astype(object)
+    annual['concept'] = annual['concept'].astype(object)
+    matched = pd.merge_asof(triggers.sort_values('Date', kind='stable'), annual.sort_values('time', kind='stable'),
+                            left_on='Date', right_on='time', by='concept', direction='forward')
+    matched = matched.dropna(subset=['time'])
+
+    reported = pd.MultiIndex.from_arrays([quarter_facts['concept'], quarter_facts['end']])
+    collided = reported.isin(pd.MultiIndex.from_arrays([matched['concept'], matched['time']]))
+    collided = list(quarter_facts['concept'][collided].unique())
+
+    matched = matched[~matched['concept'].isin(collided)]
+    fourth = pd.DataFrame({'concept': matched['concept'], 'end': matched['time'], 'val': matched['annual'] - matched['sum']})
+    fourth = fourth.drop_duplicates(subset=['concept', 'end'], keep='last')
+    return fourth, collided
+
+def _wide_facts(facts: pd.DataFrame, concepts: dict, integer: set) -> pd.DataFrame:
+    """
+    Pivots long concept, end and val rows into one column per concept, indexed by Date. Integer
+    concepts without gaps are int64, the others float64. The unit of every column not in USD is kept in attrs.
+    """
+    import numpy as np
+
+    wide = facts.set_index(['end', 'concept'])['val'].unstack('concept')
+    wide = wide.reindex(columns=list(concepts)).sort_index()
+    values = wide.to_numpy(dtype='float64')
+    complete = ~np.isnan(values).any(axis=0)
+    # Built in one go, setting the columns one by one is quadratic on wide frames
+    columns = {concept: values[:, i].astype('int64') if complete[i] and concept in integer else values[:, i]
+               for i, concept in enumerate(concepts)}
+    wide = pd.DataFrame(columns, index=wide.index.rename('Date'))
+    # Only the exceptions are kept, pandas deep copies attrs on every operation on the frame
+    wide.attrs['units'] = {concept: unit for concept, unit in concepts.items() if unit != 'USD'}
+    return wide
+
+@instrument
+def get_all_facts(company_facts: dict, annual_form: str = "10-K", quarter_form: str = "10-Q", formatted: bool = True,
+                  concepts: list = None) -> Tuple[pd.DataFrame, pd.DataFrame, list]:
     """
     Retrieves all available financial facts for a company, organizing them into quarterly and annual data.
+    Every concept is parsed in a single pass over the company facts.
 
     Parameters:
     ----------
     company_facts : dict
         A dictionary containing the financial data for a company.
+    annual_form, quarter_form : str
+        The forms annual and quarterly values are taken from.
+    formatted : bool
+        Formats values other than per-share amounts as strings without decimals, as get_fact does.
+        When False the values are int64 or float64 and take far less memory, see format_facts.
+    concepts : list
+        Restricts the result to these concepts. Concepts the company does not report are left out.
 
     Returns:
     -------
@@ -385,20 +912,126 @@ def get_all_facts(company_facts: dict) -> Tuple[pd.DataFrame, pd.DataFrame, list
         - quarter_data: A DataFrame of all quarterly financial data.
         - annual_data: A DataFrame of all annual financial data.
         - specialCase: A list of facts requiring special handling, including error messages.
+          These are facts reported at a point in time, which get_fact cannot filter by duration.
     """
-    quarter_data, annual_data, specialCase= [], [], []
-    for fact in company_facts['facts']['us-gaap'].keys():
-        try:
-            q, a = get_fact(company_facts, fact)
-        except Exception as e:
-            specialCase.append((fact, str(e)))
-            q, a = get_special_fact(company_facts, fact)
-        quarter_data.append(q)
-        annual_data.append(a)
-    quarter_data = pd.concat(quarter_data, axis=1)
-    annual_data = pd.concat(annual_data, axis=1)
+    facts, concepts = _us_gaap_facts(company_facts, concepts)
+    first_units = {concept: next(iter(body['units'])) for concept, body in concepts.items()}
+    special = [concept for concept, unit in first_units.items() if not concepts[concept]['units'][unit]['start']]
+    specialCase = [(concept, str(KeyError('start'))) for concept in special]
+    integer = {concept for concept, unit in first_units.items() if concepts[concept]['units'][unit]['int']}
+
+    facts = facts[facts['unit'].to_numpy() == facts['concept'].map(first_units).to_numpy()]
+    days = (facts['end'] - facts['start']).dt.days
+    is_special = facts['concept'].isin(special)
+
+    def first_per_period(mask):
+        selected = facts[mask].sort_values(by=['concept', 'end', 'filed'], ascending=[True, True, False], kind='stable')
+        return selected.drop_duplicates(subset=['concept', 'end'], keep='first')[['concept', 'end', 'val']]
+
+    annual_facts = first_per_period((facts['form'] == annual_form) & (is_special | (days >= 363)))
+    quarter_facts = first_per_period((facts['form'] == quarter_form) & (is_special | days.between(89, 91)))
+
+    fourth, collided = _derive_fourth_quarters_bulk(quarter_facts, annual_facts)
+    quarters = [quarter_facts[~quarter_facts['concept'].isin(collided)], fourth]
+    for concept in collided:
+        quarter_data = _period_frame(quarter_facts[quarter_facts['concept'] == concept], concept)
+        annual_data = _period_frame(annual_facts[annual_facts['concept'] == concept], concept)
+        quarter_data = _derive_fourth_quarters(quarter_data, annual_data, concept)
+        quarters.append(pd.DataFrame({'concept': concept, 'end': quarter_data.index, 'val': quarter_data[concept].to_numpy()}))
+    quarter_facts = pd.concat(quarters, ignore_index=True)
+
+    quarter_data = _wide_facts(quarter_facts, first_units, integer)
+    annual_data = _wide_facts(annual_facts, first_units, integer)
+    if formatted:
+        quarter_data, annual_data = format_facts(quarter_data), format_facts(annual_data)
     return quarter_data, annual_data, specialCase
 
+PANEL_COLUMNS = ['symbol', 'concept', 'period', 'value']
+
+def _panel_forms(symbol: str, forms: dict) -> Tuple[str, str]:
+    form = (forms or {}).get(symbol, "10-K")
+    if isinstance(form, str):
+        return form, "10-Q"
+    return tuple(form)
+
+def _company_panel(symbol: str, cik: str, concepts: list, annual_form: str, quarter_form: str, annual: bool) -> pd.DataFrame:
+    """
+    Extracts the concepts of one company from the fact store. Runs in the worker processes of get_fact_panel.
+    """
+    company_facts = fact_store.CompanyFacts(cik)
+    available = company_facts['facts'].get('us-gaap', {})
+    rows = []
+    for fact in concepts:
+        if fact not in available:
+            continue
+        try:
+            quarter_data, annual_data = get_fact(company_facts, fact, annual_form, quarter_form, formatted=False)
+        except Exception:
+            quarter_data, annual_data = get_special_fact(company_facts, fact, annual_form, quarter_form, formatted=False)
+        data = annual_data if annual else quarter_data
+        rows.append(pd.DataFrame({'symbol': symbol, 'concept': fact, 'period': data.index, 'value': data[fact].to_numpy()}))
+    if not rows:
+        return pd.DataFrame(columns=PANEL_COLUMNS)
+    return pd.concat(rows, ignore_index=True)
+
+@instrument
+def get_fact_panel(symbols: list, concepts: list, forms: dict = None, annual: bool = True, tidy: bool = True,
+                   max_workers: int = None, fetch_workers: int = 8) -> pd.DataFrame:
+    """
+    Builds a panel of financial facts for many companies at once. Company facts are fetched in
+    parallel threads and the facts are extracted on a process pool.
+
+    Parameters:
+        symbols (list): The stock ticker symbols.
+        concepts (list): The us-gaap concepts to extract, e.g. ['Revenues', 'Assets'].
+        forms (dict): The annual form per symbol when it is not 10-K, e.g. {'ASML': '20-F'}, or an
+                      (annual_form, quarter_form) pair.
+        annual (bool): Extracts annual values when True, quarterly values otherwise.
+        tidy (bool): Returns one (symbol, concept, period, value) row per value when True, otherwise
+                     a frame indexed by period with (symbol, concept) columns.
+        max_workers (int): The number of processes extracting facts. Defaults to the number of CPUs.
+        fetch_workers (int): The number of companies fetched at the same time.
+
+    Returns:
+        pd.DataFrame: The panel. Symbols that could not be loaded are listed with their error
+        message in panel.attrs['errors'].
+    """
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+    errors = {}
+    ciks = resolve_many(symbols)
+    for symbol, cik in ciks.items():
+        if cik is None:
+            errors[symbol] = "CIK not found for the provided symbol."
+    ciks = {symbol: cik for symbol, cik in ciks.items() if cik is not None}
+
+    with ThreadPoolExecutor(max_workers=fetch_workers) as executor:
+        fetched = dict(zip(ciks, executor.map(instrumentation.bind(lambda symbol: get_company_facts(ciks[symbol], symbol)), ciks)))
+    for symbol, company_facts in fetched.items():
+        if 'error' in company_facts:
+            errors[symbol] = company_facts['error']
+            del ciks[symbol]
+
+    frames = []
+    if ciks:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {symbol: executor.submit(_company_panel, symbol, cik, concepts, *_panel_forms(symbol, forms), annual)
+                       for symbol, cik in ciks.items()}
+            for symbol, future in futures.items():
+                try:
+                    frames.append(future.result())
+                except Exception as e:
+                    errors[symbol] = f"An error occurred while extracting the facts: {e}"
+
+    panel = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=PANEL_COLUMNS)
+    if not tidy:
+        panel = panel.pivot(index='period', columns=['symbol', 'concept'], values='value')
+    else:
+        panel = panel.astype({'symbol': 'category', 'concept': 'category'})
+    panel.attrs['errors'] = errors
+    return panel
+
+@instrument
 def get_description(company_facts: dict, fact: str) -> str:
     """
     Retrieves the description of a specific financial fact.
@@ -417,127 +1050,198 @@ def get_description(company_facts: dict, fact: str) -> str:
     """
     return company_facts['facts']['us-gaap'][fact]['description']
 
-def get_news_content(link: str) -> str:
+NEWS_CACHE_DIR = "newsCache"
+_news_session = None
+_news_lock = threading.Lock()
+# (host, per_host) -> [semaphore, number of calls holding or waiting for it]
+_host_limits = {}
+
+def _get_news_session(pool_size: int = 32):
+    """
+    Returns the keep-alive session shared by the news fetchers.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    global _news_session
+    with _news_lock:
+        if _news_session is None:
+            _news_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _news_session.mount('https://', adapter)
+            _news_session.mount('http://', adapter)
+        return _news_session
+
+@contextmanager
+def _host_limit(link: str, per_host: int):
+    """
+    Holds one of the per_host slots of the host of link. Calls with a different per_host get limits
+    of their own, and a limit is dropped once no call holds or waits for it.
+    """
+    from urllib.parse import urlsplit
+    key = (urlsplit(link).netloc, per_host)
+    with _news_lock:
+        limit = _host_limits.setdefault(key, [threading.Semaphore(per_host), 0])
+        limit[1] += 1
+    try:
+        with limit[0]:
+            yield
+    finally:
+        with _news_lock:
+            limit[1] -= 1
+            if limit[1] == 0:
+                del _host_limits[key]
+
+def _extract_paragraphs(content: bytes) -> str:
+    """
+    Joins the text of every <p> of a page. Only <p> elements are built, with lxml when it is installed.
+    """
+    import importlib.util
+    from bs4 import BeautifulSoup, SoupStrainer
+    parser = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+    soup = BeautifulSoup(content, parser, parse_only=SoupStrainer('p'))
+    return "\n".join([p.get_text() for p in soup.find_all('p')])
+
+def _fetch_news(link: str, timeout: float, per_host: int, max_age_hours: float) -> str:
+    """
+    Returns the text of an article from the on-disk cache, revalidating it with its ETag once it is
+    older than max_age_hours, or downloads and parses it.
+    """
+    import os
+    import json
+    import hashlib
+    from datetime import datetime, timedelta
+
+    file_path = os.path.join(NEWS_CACHE_DIR, f"{hashlib.sha256(link.encode()).hexdigest()}.json")
+    cached, request_headers = None, {}
+    if os.path.exists(file_path):
+        with open(file_path, 'r') as file:
+            cached = json.load(file)
+        file_mod_time = datetime.fromtimestamp(os.path.getmtime(file_path))
+        if datetime.now() - file_mod_time < timedelta(hours=max_age_hours):
+            return cached['text']
+        if cached.get('etag'):
+            request_headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            request_headers['If-Modified-Since'] = cached['last_modified']
+
+    with _host_limit(link, per_host):
+        response = _get_news_session().get(link, headers=request_headers, timeout=timeout)
+    instrumentation.count('http_requests')
+    instrumentation.count(f'http_status_{response.status_code}')
+    if response.status_code == 304 and cached is not None:
+        os.utime(file_path)
+        return cached['text']
+    response.raise_for_status()
+
+    instrumentation.count('bytes_downloaded', len(response.content))
+    with instrumentation.timed('html_parse_s'):
+        news_content = _extract_paragraphs(response.content)
+    os.makedirs(NEWS_CACHE_DIR, exist_ok=True)
+    with fact_store.atomic_write(file_path) as temporary, open(temporary, 'w') as file:
+        json.dump({
+            'url': link,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'text': news_content,
+        }, file)
+    return news_content
+
+@instrument
+def get_news_content(link: str, timeout: float = 10, per_host: int = 4, max_age_hours: float = 24) -> str:
     """
     Retrieves the full news content from the provided link.
+    The extracted text is cached on disk by URL and revalidated with the page's ETag.
 
     Parameters:
         link (str): The URL of the news article.
+        timeout (float): Seconds to wait for the page.
+        per_host (int): The maximum number of requests made to one host at the same time.
+        max_age_hours (float): How long a cached article is returned without asking the host.
 
     Returns:
         str: The full text content of the news article, or an error message if retrieval fails.
     """
     import requests
-    from bs4 import BeautifulSoup
     try:
-        # Fetch the news article page
-        response = requests.get(link)
-        response.raise_for_status()  # Raise an error for bad status codes
-
-        # Parse the HTML content
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Extract the main content (adjust the tag/class selection as needed)
-        paragraphs = soup.find_all('p')
-        news_content = "\n".join([p.get_text() for p in paragraphs])
-
-        return news_content
+        return _fetch_news(link, timeout, per_host, max_age_hours)
 
     except requests.RequestException as e:
         return f"An error occurred while accessing the news link: {e}"
     except Exception as e:
         return f"An unexpected error occurred: {e}"
 
-def get_indicators(tickers: dict, attribute: str, indicators: list = None) -> pd.DataFrame:
+@instrument
+def get_news_contents(links: list, max_workers: int = 16, timeout: float = 10, per_host: int = 4, max_age_hours: float = 24) -> Dict[str, str]:
+    """
+    Retrieves many news articles at once on a bounded thread pool, with at most per_host requests
+    to the same host at the same time.
+
+    Parameters:
+        links (list): The URLs of the news articles.
+        max_workers (int): The maximum number of articles fetched at the same time.
+        timeout (float): Seconds to wait for each page.
+        per_host (int): The maximum number of requests made to one host at the same time.
+        max_age_hours (float): How long a cached article is returned without asking the host.
+
+    Returns:
+        Dict[str, str]: The content of every article, or its error message, keyed by URL.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    links = list(dict.fromkeys(links))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(links) or 1))) as executor:
+        contents = executor.map(instrumentation.bind(lambda link: get_news_content(link, timeout, per_host, max_age_hours)), links)
+        return dict(zip(links, contents))
+
+@instrument
+def get_indicators(tickers: dict, attribute: str, indicators: list = None, all_years: bool = False, max_workers: int = 8) -> pd.DataFrame:
     """
     Extracts and organizes cash flow data for multiple stock tickers into a pandas DataFrame.
 
     This function processes cash flow data for various indicators, aligning them for all provided tickers. 
     Missing values for some indicators in specific tickers are padded with NaN. Additionally, the function 
     supports filtering to include only specified indicators.
-    """
-    import numpy as np
-
-    stock_data = {"symbol": [], "year": []}
-    for idx, (symbol, ticker) in enumerate(tickers.items()):
-        cash_flow = getattr(ticker, attribute)
-        stock_data["year"].append(cash_flow.columns[0])
-        cash_flow = cash_flow[cash_flow.columns[0]]
-        stock_data["symbol"].append(symbol)
-        for indicator, val in cash_flow.items():
-            if indicator not in stock_data.keys():
-                stock_data[indicator] = [val] if idx == 0 else [np.nan] * idx
-                if idx != 0:
-                    stock_data[indicator].append(val)
-            else:
-                if len(stock_data[indicator]) != idx:
-                    padding = [np.nan] * (idx - len(stock_data[indicator]))
-                    stock_data[indicator] = stock_data[indicator] + [np.nan]
-                    stock_data[indicator].append(val)
-                else:
-                    stock_data[indicator].append(val)
-
-    for indicator in stock_data.keys():
-        if len(stock_data[indicator]) != len(tickers.keys()):
-            padding = [np.nan] * (len(tickers.keys()) - len(stock_data[indicator]))
-            stock_data[indicator] = stock_data[indicator] + padding
-    df = pd.DataFrame(stock_data)
 
-    if indicators:
-        drops = []
-        for column in df.columns:
-            if column not in indicators:
-                drops.append(column)
-        df = df.drop(drops, axis=1)
-
-    return df
+    Parameters:
+        tickers (dict): yfinance Tickers keyed by symbol.
+        attribute (str): The statement to read, e.g. 'cash_flow' or 'income_stmt'.
+        indicators (list): The columns to keep, including 'symbol' and 'year' when wanted.
+        all_years (bool): Keeps a row for every reported year instead of only the latest one.
+        max_workers (int): The number of statements loaded at the same time.
 
-def line_and_bar(chart_name: str, values_index: pd.Index, values: pd.Series, history_price_index: pd.Index, history_price_open: pd.Series, percentage: bool = False) -> go.Figure:
-    """
-    The function generates a dual-axis chart that combines a bar chart and a line chart using Plotly's go.Figure. 
-    It is particularly useful for comparing two data series, 
-    such as annual revenues (or percentages) and historical stock prices, over the same time period.
+    Returns:
+        pd.DataFrame: One row per symbol and year with the columns symbol, year and the indicators.
     """
-    bar_chart = None
-
-    if percentage:
-        bar_chart = go.Bar(x=values_index, y=values, name='Bar Data', hovertemplate='%{y:.2f}%<extra></extra>')
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers) or 1))) as executor:
+        def load(ticker):
+            with instrumentation.timed('yfinance_s'):
+                return getattr(ticker, attribute)
+        statements = dict(zip(tickers, executor.map(instrumentation.bind(load), tickers.values())))
+
+    frames = {}
+    for symbol, statement in statements.items():
+        if indicators:
+            statement = statement.loc[[indicator for indicator in statement.index if indicator in indicators]]
+        if not all_years:
+            statement = statement.iloc[:, :1]
+        if statement.shape[1] == 0:
+            statement = pd.DataFrame(index=statement.index, columns=[pd.NaT])
+        frames[symbol] = statement.T
+
+    if not frames:
+        df = pd.DataFrame(columns=['symbol', 'year'])
     else:
-        bar_chart = go.Bar(x=values_index, y=values, name='Bar Data')
+        df = pd.concat(frames, names=['symbol', 'year']).reset_index()
+        df.columns.name = None
 
-    line_chart = go.Scatter(x=history_price_index, y=history_price_open, name='Line Data', mode='lines+markers', yaxis='y2')
-
-    fig = go.Figure(data=[line_chart, bar_chart])
-
-    fig.update_layout(
-        title= chart_name,
-        xaxis_title="Time",
-        yaxis_title="Values",
-        yaxis2=dict(
-            title="Stock Price",
-            overlaying="y",
-            side="right"
-        ),
-        legend_title="Legend",
-    )
-    return fig
-
-def bar_chart(title: str, df: pd.DataFrame, y: str) -> px.bar:
-    """
-    The function returns a bar chart with the title for companies.
-    It takes title, dataframe, and variable to create the bar
-    """
-    bar = px.bar(df, x='symbol', y=y, title=title, 
-                 color='symbol', labels={'symbol': 'Compnay Symbol', y: 'Value'})
+    if indicators:
+        df = df[[column for column in df.columns if column in indicators]]
 
-    bar.update_layout(
-        legend_title_text="Symbols",
-        xaxis_title="Company Symbols",
-        yaxis_title="Values"
-    )
-    
-    return bar
+    return df
 
+@instrument
 def calculate_difference(data: pd.Series) -> pd.DataFrame:
     """
     The function calculates the difference and the percentage change between consecutive values in a pandas Series. 
@@ -549,3 +1253,9 @@ def calculate_difference(data: pd.Series) -> pd.DataFrame:
 
     return difference
 
+def __getattr__(name: str):
+    # The charts moved to charts.py, which imports plotly on first use
+    if name in ('line_and_bar', 'bar_chart'):
+        import charts
+        return getattr(charts, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
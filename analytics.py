@@ -0,0 +1,170 @@
+"""
+Trailing sums, growth rates and margins computed for every column of a frame at once.
+
+Inputs are the wide frames of get_all_facts, or the panels of get_fact_panel with tidy=False,
+indexed by period end with one column per concept, or per (symbol, concept). Columns are
+reported on their own dates, so periods are matched by date rather than by row: the year-over-year
+growth of a quarter compares it with the quarter ending about 365 days earlier in the same column.
+
+Point-in-time concepts such as Assets are listed with the instant argument, e.g. the concepts of
+the specialCase list of get_all_facts. They are balances rather than flows, so their trailing
+value is the balance at the end of the window instead of a sum.
+"""
+import numpy as np
+import pandas as pd
+
+QUARTER_DAYS = 91
+YEAR_DAYS = 365.25
+# Fiscal periods of 52/53 week years end a few days apart from year to year
+TOLERANCE_DAYS = 20
+
+def _as_frame(data) -> tuple:
+    """
+    Returns data as a numeric frame, and whether it was a Series. Formatted string values are parsed.
+    """
+    is_series = isinstance(data, pd.Series)
+    frame = data.to_frame() if is_series else data
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in frame.dtypes):
+        frame = frame.apply(pd.to_numeric, errors='coerce')
+    return frame, is_series
+
+def _result(values: np.ndarray, frame: pd.DataFrame, is_series: bool):
+    result = pd.DataFrame(values, index=frame.index, columns=frame.columns)
+    return result.iloc[:, 0] if is_series else result
+
+def _stack(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the reported values of a frame as row, column, end and val rows, sorted by column and end.
+    """
+    values = frame.to_numpy(dtype='float64', na_value=np.nan)
+    rows, columns = np.nonzero(~np.isnan(values))
+    order = np.lexsort((rows, columns))
+    rows, columns = rows[order], columns[order]
+    return pd.DataFrame({'row': rows, 'column': columns, 'end': frame.index.to_numpy()[rows], 'val': values[rows, columns]})
+
+def _unstack(long: pd.DataFrame, values: pd.Series, frame: pd.DataFrame) -> np.ndarray:
+    result = np.full(frame.shape, np.nan)
+    result[long['row'].to_numpy(), long['column'].to_numpy()] = values.to_numpy(dtype='float64', na_value=np.nan)
+    return result
+
+def _instant_columns(columns: pd.Index, instant: list) -> np.ndarray:
+    """
+    Returns the positions of the point-in-time columns. Panel columns match on their concept.
+    """
+    instant = set(instant or [])
+    return np.array([i for i, column in enumerate(columns)
+                     if (column[-1] if isinstance(column, tuple) else column) in instant], dtype=int)
+
+def _lagged(long: pd.DataFrame, days: float) -> pd.Series:
+    """
+    Returns, for every value, the value of the same column reported about days earlier.
+    """
+    left = pd.DataFrame({'column': long['column'], 'end': long['end'] - pd.Timedelta(days=days)})
+    left['position'] = np.arange(len(left))
+    right = long[['column', 'end', 'val']]
+    merged = pd.merge_asof(left.sort_values('end', kind='stable'), right.sort_values('end', kind='stable'), on='end',
+                           by='column', direction='nearest', tolerance=pd.Timedelta(days=TOLERANCE_DAYS))
+    return merged.set_index('position')['val'].sort_index().set_axis(long.index)
+
+def _growth(data, days: float):
+    frame, is_series = _as_frame(data)
+    long = _stack(frame)
+    previous = _lagged(long, days)
+    growth = ((long['val'] - previous) / previous.abs()).replace([np.inf, -np.inf], np.nan)
+    return _result(_unstack(long, growth, frame), frame, is_series)
+
+def rolling_sum(data, window: int = 4, instant: list = None):
+    """
+    Sums every column over a window of consecutive periods, e.g. the last four quarters.
+
+    Parameters:
+        data (pd.DataFrame or pd.Series): Quarterly values indexed by period end.
+        window (int): The number of periods summed.
+        instant (list): The point-in-time columns, whose value at the end of the window is kept.
+
+    Returns:
+        pd.DataFrame or pd.Series: The sums, empty where the window is incomplete or its periods are
+        not consecutive.
+    """
+    frame, is_series = _as_frame(data)
+    long = _stack(frame)
+    groups = long.groupby('column', sort=False)
+    total = long['val'].copy()
+    for periods in range(1, window):
+        total += groups['val'].shift(periods)
+    span = (long['end'] - groups['end'].shift(window - 1)).dt.days
+    total = total.where(span <= QUARTER_DAYS * (window - 1) + 27)
+
+    result = _unstack(long, total, frame)
+    point_in_time = _instant_columns(frame.columns, instant)
+    result[:, point_in_time] = frame.to_numpy(dtype='float64', na_value=np.nan)[:, point_in_time]
+    return _result(result, frame, is_series)
+
+def ttm(quarter_data, instant: list = None):
+    """
+    Returns the trailing twelve months of every column of a quarterly frame.
+
+    Parameters:
+        quarter_data (pd.DataFrame or pd.Series): Quarterly values indexed by period end, e.g. the
+                                                  quarter_data of get_all_facts.
+        instant (list): The point-in-time columns, whose quarter-end balance is kept.
+
+    Returns:
+        pd.DataFrame or pd.Series: The sum of every four consecutive quarters.
+    """
+    return rolling_sum(quarter_data, 4, instant)
+
+def yoy_growth(data):
+    """
+    Returns the growth of every value over the value of the same column a year earlier, as a
+    fraction. Works for quarterly and annual frames alike.
+    """
+    return _growth(data, YEAR_DAYS)
+
+def qoq_growth(data):
+    """
+    Returns the growth of every quarterly value over the previous quarter, as a fraction.
+    """
+    return _growth(data, QUARTER_DAYS)
+
+def cagr(data, years: int):
+    """
+    Returns the compound annual growth rate of every column over a number of years.
+
+    Parameters:
+        data (pd.DataFrame or pd.Series): Values indexed by period end.
+        years (int): The length of the period, e.g. 5 compares each value with the one five years before.
+
+    Returns:
+        pd.DataFrame or pd.Series: The rates, empty where either value is not positive.
+    """
+    frame, is_series = _as_frame(data)
+    long = _stack(frame)
+    previous = _lagged(long, YEAR_DAYS * years)
+    positive = (long['val'] > 0) & (previous > 0)
+    rate = (long['val'] / previous.where(positive)) ** (1 / years) - 1
+    return _result(_unstack(long, rate, frame), frame, is_series)
+
+def rolling_margin(numerator, denominator, window: int = 4, instant: list = None):
+    """
+    Returns the ratio of two rolling sums, e.g. the trailing net margin of
+    NetIncomeLoss over Revenues. Frames are aligned by period and column, so the concepts of
+    a panel can be compared symbol by symbol:
+
+        rolling_margin(panel.xs('NetIncomeLoss', axis=1, level='concept'),
+                       panel.xs('Revenues', axis=1, level='concept'))
+
+    Parameters:
+        numerator, denominator (pd.DataFrame or pd.Series): Quarterly values indexed by period end.
+        window (int): The number of periods summed, 1 for the margin of each period.
+        instant (list): The point-in-time columns, e.g. ['Assets'] for a return on assets. Their value
+                        at the end of the window is used.
+
+    Returns:
+        pd.DataFrame or pd.Series: The margins.
+    """
+    numerator = rolling_sum(numerator, window, instant)
+    denominator = rolling_sum(denominator, window, instant)
+    if isinstance(numerator, pd.DataFrame) and isinstance(denominator, pd.Series):
+        return numerator.div(denominator, axis=0).replace([np.inf, -np.inf], np.nan)
+    return (numerator / denominator).replace([np.inf, -np.inf], np.nan)
@@ -0,0 +1,256 @@
+"""
+Offline benchmarks of the fetch, parse and extraction hot paths.
+
+    python -m benchmarks.bench                    # run and compare with benchmarks/baseline.json
+    python -m benchmarks.bench --save-baseline    # run and store the results as the new baseline
+    python -m benchmarks.bench --filter get_fact --repeat 10
+    python -m benchmarks.bench --filter import       # interpreter start-up and module import times
+
+Company facts are served by a local server and yfinance Tickers are replaced with canned ones, so
+no request leaves the machine. Every benchmark reports its best wall time, its peak traced memory
+measured in a separate run, and its throughput in facts or tickers per second.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from contextlib import contextmanager
+from unittest import mock
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import pandas as pd
+import edgar
+import fact_store
+import Functions
+from benchmarks import fixtures
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+class Benchmark:
+    """
+    A measured call.
+
+    Parameters:
+        name (str): The name results are stored under.
+        run (Callable): The measured call.
+        items (int): The number of facts or tickers one call handles.
+        unit (str): What items counts, e.g. 'facts'.
+        setup (Callable): Runs before every call, outside of the measurement.
+    """
+    def __init__(self, name: str, run, items: int, unit: str, setup=None):
+        self.name = name
+        self.run = run
+        self.items = items
+        self.unit = unit
+        self.setup = setup or (lambda: None)
+
+def _result_mb(result) -> float:
+    """
+    Returns the memory held by the frames of a result, counting the Python objects they hold.
+    """
+    frames = result if isinstance(result, tuple) else (result,)
+    return sum(frame.memory_usage(deep=True).sum() for frame in frames if isinstance(frame, pd.DataFrame)) / 2**20
+
+def measure(benchmark: Benchmark, repeat: int) -> dict:
+    """
+    Runs a benchmark repeat times for its wall time, then once more under tracemalloc for its peak
+    memory and the size of its result.
+    """
+    times = []
+    for _ in range(repeat):
+        benchmark.setup()
+        start = time.perf_counter()
+        benchmark.run()
+        times.append(time.perf_counter() - start)
+
+    benchmark.setup()
+    tracemalloc.start()
+    result = benchmark.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    return {
+        'wall_s': best,
+        'mean_s': sum(times) / len(times),
+        'peak_mb': peak / 2**20,
+        'result_mb': _result_mb(result),
+        'throughput': benchmark.items / best if best > 0 else float('inf'),
+        'unit': f"{benchmark.unit}/s",
+    }
+
+@contextmanager
+def offline_environment(documents: dict):
+    """
+    Runs the benchmarks in a scratch directory, with the EDGAR client pointed at a local server and
+    yfinance Tickers replaced with canned ones.
+    """
+    server = fixtures.SecServer(documents)
+    directory = tempfile.mkdtemp(prefix="benchmarks-")
+    previous_directory = os.getcwd()
+    previous_client = edgar.get_client()
+    os.chdir(directory)
+    edgar.set_client(edgar.EdgarClient(rate=1000, url_map={"https://data.sec.gov": server.url}))
+    try:
+        with mock.patch('yfinance.Ticker', fixtures.CannedTicker):
+            yield
+    finally:
+        edgar.set_client(previous_client)
+        os.chdir(previous_directory)
+        server.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+def _remove_company(cik: str) -> None:
+    Functions.clear_caches()
+    shutil.rmtree(fact_store.company_dir(cik), ignore_errors=True)
+
+def _concept_sample(company_facts: dict, count: int = 20) -> list:
+    return list(company_facts['facts']['us-gaap'])[:count]
+
+def _extract(company_facts, concepts: list) -> None:
+    for fact in concepts:
+        try:
+            Functions.get_fact(company_facts, fact)
+        except Exception:
+            Functions.get_special_fact(company_facts, fact)
+
+def _import(module: str) -> None:
+    """
+    Imports a module in a fresh interpreter, so nothing is already loaded.
+    """
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=REPO_ROOT, check=True)
+
+def build_benchmarks(sizes: list, documents: dict, tickers: int) -> list:
+    """
+    Returns the benchmarks of the yfinance paths and, for every filer size, of the companyfacts paths.
+    """
+    symbols = fixtures.portfolio_symbols(tickers)
+    portfolio = pd.DataFrame({'symbol': symbols, 'shares': 1})
+    canned = {symbol: fixtures.CannedTicker(symbol) for symbol in symbols}
+    benchmarks = [
+        Benchmark("import[python]", lambda: _import("sys"), 1, 'imports'),
+        Benchmark("import[Functions]", lambda: _import("Functions"), 1, 'imports'),
+        Benchmark("import[charts]", lambda: _import("charts"), 1, 'imports'),
+        Benchmark(f"read_portfolio[{tickers}]", lambda: Functions.read_portfolio(portfolio.copy()), tickers, 'tickers',
+                  Functions.clear_caches),
+        Benchmark(f"get_indicators[{tickers}]", lambda: Functions.get_indicators(canned, 'cash_flow'), tickers, 'tickers'),
+    ]
+
+    for size in sizes:
+        cik = fixtures.CIKS[size]
+        document = json.loads(documents[cik])
+        facts = fixtures.count_facts(document)
+        sample = _concept_sample(document)
+        sample_facts = sum(len(records) for fact in sample for records in document['facts']['us-gaap'][fact]['units'].values())
+
+        def warm_store(cik=cik):
+            Functions.clear_caches()
+            if not fact_store.has_company(cik):
+                Functions.get_company_facts(cik, cik)
+
+        def stored(cik=cik):
+            return Functions.get_company_facts(cik, cik)
+
+        benchmarks += [
+            Benchmark(f"get_company_facts[{size},download]", lambda cik=cik: Functions.get_company_facts(cik, cik), facts,
+                      'facts', lambda cik=cik: _remove_company(cik)),
+            Benchmark(f"get_company_facts[{size},stored]", stored, facts, 'facts', warm_store),
+            Benchmark(f"get_fact[{size},{len(sample)} concepts]", lambda stored=stored, sample=sample: _extract(stored(), sample),
+                      sample_facts, 'facts', warm_store),
+            Benchmark(f"get_all_facts[{size}]", lambda stored=stored: Functions.get_all_facts(stored()), facts, 'facts',
+                      warm_store),
+            Benchmark(f"get_all_facts[{size},typed]", lambda stored=stored: Functions.get_all_facts(stored(), formatted=False),
+                      facts, 'facts', warm_store),
+        ]
+    return benchmarks
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float = 5) -> list:
+    """
+    Prints the results next to the baseline and returns the names of the benchmarks slower than
+    threshold times their baseline. Slowdowns under min_delta_ms are timer noise on the fastest
+    benchmarks and are not reported.
+    """
+    regressions = []
+    print(f"{'benchmark':<44}{'wall ms':>10}{'peak MB':>10}{'result MB':>10}{'throughput':>22}{'vs baseline':>13}")
+    for name, result in results.items():
+        line = (f"{name:<44}{result['wall_s'] * 1000:>10.1f}{result['peak_mb']:>10.1f}{result.get('result_mb', 0):>10.1f}"
+                f"{result['throughput']:>14.0f} {result['unit']:<8}")
+        base = baseline.get('results', {}).get(name)
+        if base:
+            ratio = result['wall_s'] / base['wall_s']
+            line += f"{ratio:>12.2f}x"
+            if ratio > threshold and (result['wall_s'] - base['wall_s']) * 1000 > min_delta_ms:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+    return regressions
+
+def run(pattern: str = None, sizes: list = None, repeat: int = 5, tickers: int = 50) -> dict:
+    """
+    Runs the benchmarks offline.
+
+    Parameters:
+        pattern (str): Only runs the benchmarks whose name contains it.
+        sizes (list): The filer sizes of fixtures.SIZES to benchmark. All by default.
+        repeat (int): The number of timed calls per benchmark.
+        tickers (int): The number of canned tickers of the portfolio benchmarks.
+
+    Returns:
+        dict: The environment the benchmarks ran in and the results keyed by benchmark name.
+    """
+    sizes = sizes or list(fixtures.SIZES)
+    documents = {fixtures.CIKS[size]: document for size, document in fixtures.company_facts_fixtures(sizes).items()}
+    results = {}
+    with offline_environment(documents):
+        for benchmark in build_benchmarks(sizes, documents, tickers):
+            if pattern and pattern not in benchmark.name:
+                continue
+            results[benchmark.name] = measure(benchmark, repeat)
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks.")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--sizes", nargs="+", choices=list(fixtures.SIZES), help="Filer sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per benchmark")
+    parser.add_argument("--tickers", type=int, default=50, help="Canned tickers in the portfolio benchmarks")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Store the results in {BASELINE_FILE}")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown over the baseline reported as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=5, help="Slowdowns under this many milliseconds are ignored")
+    args = parser.parse_args()
+
+    report = run(args.filter, args.sizes, args.repeat, args.tickers)
+    baseline = {}
+    if os.path.exists(BASELINE_FILE) and not args.save_baseline:
+        with open(BASELINE_FILE, 'r') as file:
+            baseline = json.load(file)
+    regressions = compare(report['results'], baseline, args.threshold, args.min_delta_ms)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+    if args.save_baseline:
+        if os.path.exists(BASELINE_FILE):
+            with open(BASELINE_FILE, 'r') as file:
+                baseline = json.load(file)
+            baseline.setdefault('results', {}).update(report['results'])
+            report = {**report, 'results': baseline['results']}
+        with open(BASELINE_FILE, 'w') as file:
+            json.dump(report, file, indent=4)
+    sys.exit(1 if regressions else 0)
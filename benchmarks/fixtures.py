@@ -0,0 +1,182 @@
+"""
+Deterministic stand-ins for the data the benchmarks read: companyfacts documents of small, medium
+and very large filers, a local server answering like the SEC API, and yfinance Tickers with canned
+responses.
+"""
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pandas as pd
+
+# (concepts, years) per filer size. The large filer holds about as many values as the largest real ones.
+SIZES = {
+    'small': (40, 6),
+    'medium': (300, 12),
+    'large': (1200, 16),
+}
+CIKS = {'small': '0000000101', 'medium': '0000000102', 'large': '0000000103'}
+QUARTERS = [((1, 1), (3, 31)), ((4, 1), (6, 30)), ((7, 1), (9, 30))]
+
+def _record(start, end, val, accn, fy, fp, form, filed, frame=None) -> dict:
+    record = {'start': start.isoformat()} if start is not None else {}
+    record.update({'end': end.isoformat(), 'val': val, 'accn': accn, 'fy': fy, 'fp': fp, 'form': form,
+                   'filed': filed.isoformat()})
+    if frame:
+        record['frame'] = frame
+    return record
+
+def make_company_facts(cik: str, concepts: int, years: int, seed: int = 0) -> dict:
+    """
+    Returns a companyfacts document shaped like the SEC's. Every year has a 10-K and three 10-Qs
+    with year-to-date values, and every value is reported again as a comparative figure the year
+    after. A quarter of the concepts are balances reported at a point in time and a quarter are
+    per-share amounts.
+    """
+    rng = random.Random(seed)
+    first_year = 2024 - years
+    us_gaap = {}
+    for index in range(concepts):
+        kind = rng.choice(['duration', 'duration', 'instant', 'per_share'])
+        unit = 'USD/shares' if kind == 'per_share' else 'USD'
+        records = []
+        for year in range(first_year, first_year + years):
+            base = round(rng.uniform(-2, 10), 2) if kind == 'per_share' else rng.randint(10**6, 10**10)
+            year_start = date(year, 1, 1) if kind != 'instant' else None
+            for filing in range(2):
+                fy = year + filing
+                accn = f"{cik}-{str(fy)[2:]}-{rng.randint(1, 99999):06d}"
+                filed = date(year + 1 + filing, 2, 20)
+                frame = f"CY{year}" if filing == 0 else None
+                records.append(_record(year_start, date(year, 12, 31), base, accn, fy, 'FY', '10-K', filed, frame))
+                for quarter, ((start_month, start_day), (end_month, end_day)) in enumerate(QUARTERS, 1):
+                    start, end = date(year, start_month, start_day), date(year, end_month, end_day)
+                    value = round(base / 4, 2) if kind == 'per_share' else base // 4
+                    quarter_filed = end + timedelta(days=40 + 365 * filing)
+                    quarter_accn = f"{accn}-Q{quarter}"
+                    records.append(_record(start if kind != 'instant' else None, end, value, quarter_accn, fy,
+                                           f'Q{quarter}', '10-Q', quarter_filed))
+                    if kind != 'instant' and quarter > 1:
+                        records.append(_record(year_start, end, value * quarter, quarter_accn, fy, f'Q{quarter}',
+                                               '10-Q', quarter_filed))
+        us_gaap[f"Concept{index:04d}"] = {
+            'label': f"Concept {index}",
+            'description': f"Synthetic concept {index} of kind {kind}.",
+            'units': {unit: records},
+        }
+    dei = {'EntityCommonStockSharesOutstanding': {'label': 'Shares Outstanding', 'description': '', 'units': {
+        'shares': [_record(None, date(2023, 12, 31), 10**9, f"{cik}-24-000001", 2024, 'FY', '10-K', date(2024, 2, 20))]}}}
+    return {'cik': int(cik), 'entityName': f"Benchmark Filer {cik}", 'facts': {'dei': dei, 'us-gaap': us_gaap}}
+
+def count_facts(company_facts: dict) -> int:
+    return sum(len(records) for taxonomy in company_facts['facts'].values()
+               for body in taxonomy.values() for records in body['units'].values())
+
+def company_facts_fixtures(sizes: list = None) -> dict:
+    """
+    Returns the encoded companyfacts document of every filer size, keyed by size.
+    """
+    return {size: json.dumps(make_company_facts(CIKS[size], *SIZES[size], seed=index)).encode()
+            for index, size in enumerate(SIZES) if sizes is None or size in sizes}
+
+class SecServer:
+    """
+    A local HTTP server answering companyfacts requests with the fixtures, with ETags so
+    conditional requests get 304 Not Modified.
+
+    Parameters:
+        documents (dict): The encoded companyfacts documents keyed by CIK.
+    """
+    def __init__(self, documents: dict):
+        documents = dict(documents)
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                cik = self.path.rsplit('CIK', 1)[-1].split('.')[0]
+                body = documents.get(cik)
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                etag = f'"{len(body)}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+def _statement(rng: random.Random, rows: list, years: int = 4) -> pd.DataFrame:
+    columns = pd.to_datetime([f"{2023 - offset}-12-31" for offset in range(years)])
+    return pd.DataFrame([[float(rng.randint(-10**9, 10**10)) for _ in columns] for _ in rows], index=rows, columns=columns)
+
+CASH_FLOW_ROWS = ['Free Cash Flow', 'Operating Cash Flow', 'Capital Expenditure', 'Repurchase Of Capital Stock',
+                  'Issuance Of Debt', 'Repayment Of Debt', 'Cash Dividends Paid', 'Stock Based Compensation']
+INCOME_ROWS = ['Total Revenue', 'Gross Profit', 'Operating Income', 'Net Income', 'Diluted EPS', 'EBITDA']
+
+class CannedTicker:
+    """
+    Answers like a yfinance Ticker from canned data, after a fixed delay standing in for the network.
+
+    Parameters:
+        symbol (str): The stock ticker symbol.
+        latency (float): Seconds every property takes to return.
+    """
+    def __init__(self, symbol: str, latency: float = 0.02):
+        self.ticker = symbol
+        self.latency = latency
+        rng = random.Random(symbol)
+        price = round(rng.uniform(5, 500), 2)
+        self._info = {'symbol': symbol, 'sector': rng.choice(['Technology', 'Healthcare', 'Industrials']),
+                      'industry': 'Benchmark', 'currentPrice': price, 'trailingPE': round(rng.uniform(5, 60), 2),
+                      'priceToBook': round(rng.uniform(0.5, 20), 2), 'marketCap': rng.randint(10**8, 10**12)}
+        self._price_targets = {'current': price, 'low': price * 0.8, 'high': price * 1.3, 'mean': price * 1.1,
+                               'median': price * 1.1}
+        self._recommendations = pd.DataFrame([{'period': '0m', 'strongBuy': rng.randint(0, 10), 'buy': rng.randint(0, 20),
+                                               'hold': rng.randint(0, 20), 'sell': rng.randint(0, 5),
+                                               'strongSell': rng.randint(0, 3)}])
+        self._cash_flow = _statement(rng, CASH_FLOW_ROWS)
+        self._income_stmt = _statement(rng, INCOME_ROWS)
+
+    def _respond(self, value):
+        time.sleep(self.latency)
+        return value
+
+    @property
+    def info(self):
+        return self._respond(dict(self._info))
+
+    @property
+    def analyst_price_targets(self):
+        return self._respond(dict(self._price_targets))
+
+    @property
+    def recommendations_summary(self):
+        return self._respond(self._recommendations.copy())
+
+    @property
+    def cash_flow(self):
+        return self._respond(self._cash_flow.copy())
+
+    @property
+    def income_stmt(self):
+        return self._respond(self._income_stmt.copy())
+
+def portfolio_symbols(count: int = 50) -> list:
+    return [f"BM{index:03d}" for index in range(count)]
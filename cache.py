@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+import instrumentation
+
+_MISSING = object()
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded cache that evicts the least recently used entry and counts hits
+    and misses.
+
+    Parameters:
+        maxsize (int): The maximum number of entries kept.
+        ttl (float): Seconds after which an entry expires. Entries never expire when omitted.
+        name (str): The name hits and misses are counted under by the instrumentation.
+    """
+    def __init__(self, maxsize: int = 128, ttl: float = None, name: str = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hit_counter = f"{name or 'cache'}_hit"
+        self.miss_counter = f"{name or 'cache'}_miss"
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key, _MISSING)
+            if entry is not _MISSING and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                instrumentation.count(self.miss_counter)
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            instrumentation.count(self.hit_counter)
+            return entry[1]
+
+    def put(self, key, value) -> None:
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> dict:
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries), 'maxsize': self.maxsize}
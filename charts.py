@@ -0,0 +1,145 @@
+"""
+Plotly charts of the notebooks. Importing this module loads plotly and applies the dark template,
+so the data functions in Functions.py stay free of the plotting stack.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+from instrumentation import instrument
+pio.templates.default = "plotly_dark"
+
+def _positions(index: pd.Index) -> np.ndarray:
+    if isinstance(index, pd.DatetimeIndex):
+        return index.asi8.astype('float64')
+    return np.asarray(index, dtype='float64')
+
+def lttb(series: pd.Series, points: int) -> pd.Series:
+    """
+    Downsamples a series to points values with the Largest-Triangle-Three-Buckets algorithm, which
+    keeps the first and last values and, from every bucket in between, the value that best preserves
+    the shape of the line.
+    """
+    series = series.dropna()
+    if points >= len(series) or points < 3:
+        return series
+    x, y = _positions(series.index), series.to_numpy(dtype='float64')
+    edges = np.linspace(1, len(series) - 1, points - 1).astype(int)
+
+    selected = np.empty(points, dtype=int)
+    selected[0], selected[-1] = 0, len(series) - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        following = slice(end, edges[bucket + 2]) if bucket + 2 < len(edges) else slice(len(series) - 1, len(series))
+        average_x, average_y = x[following].mean(), y[following].mean()
+        areas = np.abs((x[previous] - average_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (average_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return series.iloc[selected]
+
+def minmax(series: pd.Series, points: int) -> pd.Series:
+    """
+    Downsamples a series to about points values by keeping the lowest and highest value of each of
+    points / 2 buckets, so every peak and trough stays visible.
+    """
+    series = series.dropna()
+    if points >= len(series) or points < 2:
+        return series
+    buckets = np.arange(len(series)) * (points // 2) // len(series)
+    order = np.lexsort((series.to_numpy(), buckets))
+    starts = np.flatnonzero(np.r_[True, buckets[order][1:] != buckets[order][:-1]])
+    ends = np.r_[starts[1:], len(series)] - 1
+    selected = np.unique(np.r_[0, order[starts], order[ends], len(series) - 1])
+    return series.iloc[selected]
+
+DOWNSAMPLERS = {'lttb': lttb, 'minmax': minmax}
+
+def resample_prices(prices: pd.Series, rule: str, periods: pd.Index = None) -> pd.Series:
+    """
+    Resamples daily prices to a coarser frequency, keeping the last price of every period.
+
+    Parameters:
+        prices (pd.Series): Prices indexed by date.
+        rule (str): A pandas frequency such as 'ME', 'QE' or 'YE', or 'periods' to take the last price
+                    on or before each date of periods, e.g. the fiscal period ends of the bars.
+        periods (pd.Index): The dates used with rule='periods'.
+
+    Returns:
+        pd.Series: The resampled prices.
+    """
+    prices = prices.dropna()
+    if isinstance(prices.index, pd.DatetimeIndex) and prices.index.tz is not None:
+        prices = prices.tz_localize(None)
+    if rule != 'periods':
+        return prices.resample(rule).last().dropna()
+    periods = pd.DatetimeIndex(pd.to_datetime(periods)).sort_values()
+    return prices.sort_index().reindex(periods, method='ffill').dropna()
+
+@instrument
+def line_and_bar(chart_name: str, values_index: pd.Index, values: pd.Series, history_price_index: pd.Index, history_price_open: pd.Series, percentage: bool = False,
+                 max_points: int = None, method: str = 'lttb', resample: str = None, webgl: bool = False) -> go.Figure:
+    """
+    The function generates a dual-axis chart that combines a bar chart and a line chart using Plotly's go.Figure. 
+    It is particularly useful for comparing two data series, 
+    such as annual revenues (or percentages) and historical stock prices, over the same time period.
+
+    Long price histories can be reduced before they are put into the figure:
+        max_points (int): Downsamples the line to about this many points. Twice the chart width in
+                          pixels, e.g. 2000, looks the same as the full series.
+        method (str): 'lttb' to keep the shape of the line or 'minmax' to keep every peak and trough.
+        resample (str): Resamples the prices first, see resample_prices. 'periods' takes the price
+                        at each bar, so the line and the bars share their dates.
+        webgl (bool): Draws the line with Scattergl, which renders long lines much faster.
+    """
+    if resample is not None or max_points is not None:
+        prices = pd.Series(np.asarray(history_price_open), index=history_price_index)
+        if resample is not None:
+            prices = resample_prices(prices, resample, values_index)
+        if max_points is not None:
+            prices = DOWNSAMPLERS[method](prices, max_points)
+        history_price_index, history_price_open = prices.index, prices
+
+    bar_chart = None
+
+    if percentage:
+        bar_chart = go.Bar(x=values_index, y=values, name='Bar Data', hovertemplate='%{y:.2f}%<extra></extra>')
+    else:
+        bar_chart = go.Bar(x=values_index, y=values, name='Bar Data')
+
+    scatter = go.Scattergl if webgl else go.Scatter
+    line_chart = scatter(x=history_price_index, y=history_price_open, name='Line Data', mode='lines+markers', yaxis='y2')
+
+    fig = go.Figure(data=[line_chart, bar_chart])
+
+    fig.update_layout(
+        title= chart_name,
+        xaxis_title="Time",
+        yaxis_title="Values",
+        yaxis2=dict(
+            title="Stock Price",
+            overlaying="y",
+            side="right"
+        ),
+        legend_title="Legend",
+    )
+    return fig
+
+@instrument
+def bar_chart(title: str, df: pd.DataFrame, y: str) -> px.bar:
+    """
+    The function returns a bar chart with the title for companies.
+    It takes title, dataframe, and variable to create the bar
+    """
+    bar = px.bar(df, x='symbol', y=y, title=title, 
+                 color='symbol', labels={'symbol': 'Compnay Symbol', y: 'Value'})
+
+    bar.update_layout(
+        legend_title_text="Symbols",
+        xaxis_title="Company Symbols",
+        yaxis_title="Values"
+    )
+    
+    return bar
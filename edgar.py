@@ -0,0 +1,186 @@
+import random
+import threading
+import time
+from typing import Dict
+import requests
+from requests.adapters import HTTPAdapter
+from headers import headers
+import instrumentation
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    A thread-safe token bucket that keeps requests under a fixed rate.
+
+    Parameters:
+        rate (float): Tokens added per second.
+        capacity (float): The largest burst allowed. Defaults to one token, which spaces
+                          requests evenly at 1/rate seconds.
+    """
+    def __init__(self, rate: float = 10, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Blocks until the tokens are available and returns the seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class EdgarResponse:
+    """
+    The outcome of an EDGAR request.
+
+    Attributes:
+        status (int): The HTTP status code of the final attempt.
+        data: The decoded JSON body, the text of a text request, or None when the server answered
+              304 Not Modified.
+        validators (dict): The ETag and Last-Modified values to send with the next request.
+        not_modified (bool): True when the cached copy is still current.
+        retries (int): The number of attempts that were retried.
+        waited (float): Seconds spent waiting on the rate limiter.
+        size (int): Bytes downloaded.
+    """
+    def __init__(self, status: int, data, validators: dict, retries: int, waited: float, size: int):
+        self.status = status
+        self.data = data
+        self.validators = validators
+        self.not_modified = status == 304
+        self.retries = retries
+        self.waited = waited
+        self.size = size
+
+class EdgarClient:
+    """
+    A pooled HTTP session for the SEC EDGAR API with a shared rate limit, retries with
+    jittered exponential backoff and conditional requests.
+
+    Parameters:
+        rate (float): The maximum number of requests per second. SEC allows 10.
+        max_retries (int): How many times a failed request is retried.
+        backoff (float): The base delay in seconds between retries.
+        timeout (float): Seconds to wait for each response.
+        pool_size (int): The number of keep-alive connections kept per host.
+        url_map (dict): Prefix replacements applied to every URL, e.g.
+                        {"https://data.sec.gov": "http://127.0.0.1:8000"} to use a local server.
+    """
+    def __init__(self, rate: float = 10, max_retries: int = 5, backoff: float = 0.5, timeout: float = 30,
+                 pool_size: int = 10, url_map: Dict[str, str] = None, request_headers: dict = None):
+        self.limiter = TokenBucket(rate)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.url_map = url_map or {}
+
+        self.session = requests.Session()
+        # requests sets the Host header from each URL, the static one only matches data.sec.gov
+        self.session.headers.update({key: value for key, value in (request_headers or headers).items() if key.lower() != 'host'})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _resolve(self, url: str) -> str:
+        for prefix, replacement in self.url_map.items():
+            if url.startswith(prefix):
+                return replacement + url[len(prefix):]
+        return url
+
+    def _delay(self, attempt: int, response: requests.Response = None) -> float:
+        if response is not None and response.headers.get('Retry-After', '').isdigit():
+            return float(response.headers['Retry-After'])
+        return self.backoff * 2 ** attempt + random.uniform(0, self.backoff)
+
+    def get(self, url: str, validators: dict = None, text: bool = False) -> EdgarResponse:
+        """
+        Fetches a JSON document, sending the validators of the cached copy if there is one.
+
+        Parameters:
+            url (str): The EDGAR URL.
+            validators (dict): The 'etag' and 'last_modified' of the cached copy.
+            text (bool): Returns the body as text instead of decoding JSON, e.g. for the EDGAR indexes.
+
+        Returns:
+            EdgarResponse: The decoded document, or a not-modified response.
+
+        Raises:
+            requests.RequestException: When the request still fails after all retries.
+        """
+        url = self._resolve(url)
+        request_headers = {}
+        if validators:
+            if validators.get('etag'):
+                request_headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                request_headers['If-Modified-Since'] = validators['last_modified']
+
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            waited += self.limiter.acquire()
+            try:
+                response = self.session.get(url, headers=request_headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                time.sleep(self._delay(attempt, response))
+                continue
+            break
+
+        instrumentation.count('http_requests')
+        instrumentation.count(f'http_status_{response.status_code}')
+        instrumentation.count('http_retries', attempt)
+        instrumentation.count('rate_limit_wait_s', waited)
+        if response.status_code == 304:
+            return EdgarResponse(304, None, validators, attempt, waited, 0)
+
+        response.raise_for_status()
+        new_validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        instrumentation.count('bytes_downloaded', len(response.content))
+        if text:
+            data = response.text
+        else:
+            with instrumentation.timed('json_parse_s'):
+                data = response.json()
+        return EdgarResponse(response.status_code, data, new_validators, attempt, waited, len(response.content))
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> EdgarClient:
+    """
+    Returns the EdgarClient shared by the whole process, creating it on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = EdgarClient()
+        return _client
+
+def set_client(client: EdgarClient) -> None:
+    """
+    Replaces the shared EdgarClient, e.g. with one pointed at a local server.
+    """
+    global _client
+    with _client_lock:
+        _client = client
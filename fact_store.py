@@ -0,0 +1,383 @@
+import os
+import json
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Tuple
+import pandas as pd
+import instrumentation
+
+STORE_ROOT = "companiesFacts"
+RECORD_FIELDS = ['start', 'end', 'val', 'form', 'filed', 'fy', 'fp', 'accn', 'frame']
+FACT_COLUMNS = ['taxonomy', 'concept', 'unit', *RECORD_FIELDS]
+ROW_GROUP_SIZE = 16384
+# Read back as categoricals, straight from the Parquet dictionaries
+CATEGORY_COLUMNS = ['taxonomy', 'concept', 'unit', 'form']
+FILING_FORMS = ('10-K', '10-Q', '20-F', '10-K/A', '10-Q/A', '20-F/A')
+
+@contextmanager
+def atomic_write(file_path: str):
+    """
+    Yields a temporary path next to file_path that replaces file_path once the block completes, so
+    readers see the old file or the new one but never a partly written one.
+
+        with atomic_write(path) as temporary:
+            frame.to_parquet(temporary)
+    """
+    temporary = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield temporary
+        os.replace(temporary, file_path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+def company_dir(cik: str, root: str = STORE_ROOT) -> str:
+    """
+    Returns the partition directory of a company in the fact store.
+    """
+    return os.path.join(root, f"CIK{str(cik).zfill(10)}")
+
+def facts_path(cik: str, root: str = STORE_ROOT) -> str:
+    return os.path.join(company_dir(cik, root), "facts.parquet")
+
+def meta_path(cik: str, root: str = STORE_ROOT) -> str:
+    return os.path.join(company_dir(cik, root), "meta.json")
+
+def store_version(cik: str, root: str = STORE_ROOT) -> int:
+    """
+    Returns a number that changes every time the facts of the company are written or merged.
+    """
+    return os.stat(meta_path(cik, root)).st_mtime_ns
+
+def list_companies(root: str = STORE_ROOT) -> list:
+    """
+    Returns the CIKs of every company in the fact store.
+    """
+    if not os.path.isdir(root):
+        return []
+    return sorted(name[len("CIK"):] for name in os.listdir(root)
+                  if name.startswith("CIK") and has_company(name[len("CIK"):], root))
+
+def has_company(cik: str, root: str = STORE_ROOT) -> bool:
+    return os.path.exists(facts_path(cik, root)) and os.path.exists(meta_path(cik, root))
+
+def flatten_company_facts(company_facts: dict) -> Tuple[pd.DataFrame, dict]:
+    """
+    Normalizes a companyfacts document into one long table with a row per reported value.
+
+    Parameters:
+        company_facts (dict): A document from the SEC EDGAR `companyfacts` endpoint.
+
+    Returns:
+        Tuple[pd.DataFrame, dict]:
+            - The facts with the columns of FACT_COLUMNS, in the order of the document.
+            - The concepts of every taxonomy with their label, description and units. Units keep
+              the order of the document and record whether every value was an integer.
+    """
+    columns = {column: [] for column in FACT_COLUMNS}
+    concepts = {}
+    for taxonomy, taxonomy_facts in company_facts.get('facts', {}).items():
+        concepts[taxonomy] = {}
+        for concept, body in taxonomy_facts.items():
+            units = {}
+            for unit, records in body['units'].items():
+                values = [record['val'] for record in records]
+                units[unit] = {
+                    'int': all(type(value) is int for value in values),
+                    'start': any('start' in record for record in records),
+                }
+                columns['taxonomy'].extend([taxonomy] * len(records))
+                columns['concept'].extend([concept] * len(records))
+                columns['unit'].extend([unit] * len(records))
+                columns['val'].extend(values)
+                for field in RECORD_FIELDS:
+                    if field != 'val':
+                        columns[field].extend([record.get(field) for record in records])
+            concepts[taxonomy][concept] = {
+                'label': body.get('label'),
+                'description': body.get('description'),
+                'units': units,
+            }
+
+    facts = pd.DataFrame(columns, columns=FACT_COLUMNS)
+    for column in ['start', 'end', 'filed']:
+        facts[column] = pd.to_datetime(facts[column], format='%Y-%m-%d')
+    facts['val'] = facts['val'].astype('float64')
+    facts['fy'] = facts['fy'].astype('Int64')
+    return facts, concepts
+
+def write_company_facts(company_facts: dict, validators: dict = None, root: str = STORE_ROOT) -> str:
+    """
+    Writes a companyfacts document to the fact store as a Parquet table partitioned by CIK.
+
+    Parameters:
+        company_facts (dict): A document from the SEC EDGAR `companyfacts` endpoint.
+        validators (dict): The ETag and Last-Modified of the download, used for conditional requests.
+        root (str): The root directory of the fact store.
+
+    Returns:
+        str: The CIK of the company, zero padded to 10 digits.
+    """
+    cik = str(company_facts['cik']).zfill(10)
+    with instrumentation.timed('flatten_s'):
+        facts, concepts = flatten_company_facts(company_facts)
+    # Sorting by concept lets row group statistics skip everything but the requested concepts
+    facts = facts.sort_values(by=['taxonomy', 'concept'], kind='stable')
+
+    os.makedirs(company_dir(cik, root), exist_ok=True)
+    with instrumentation.timed('store_write_s'):
+        with atomic_write(facts_path(cik, root)) as temporary:
+            facts.to_parquet(temporary, index=False, row_group_size=ROW_GROUP_SIZE)
+    meta = {
+        'cik': company_facts['cik'],
+        'entityName': company_facts.get('entityName'),
+        'concepts': concepts,
+        'validators': validators,
+    }
+    with atomic_write(meta_path(cik, root)) as temporary, open(temporary, 'w') as file:
+        json.dump(meta, file, separators=(',', ':'))
+    return cik
+
+def merge_company_facts(company_facts: dict, validators: dict = None, root: str = STORE_ROOT) -> int:
+    """
+    Merges a newer companyfacts document into the stored facts of the company. Values already in the
+    store are kept, so facts dropped from the newer document are not lost.
+
+    Parameters:
+        company_facts (dict): A document from the SEC EDGAR `companyfacts` endpoint.
+        validators (dict): The ETag and Last-Modified of the download.
+        root (str): The root directory of the fact store.
+
+    Returns:
+        int: The number of values that were not in the store before.
+    """
+    cik = str(company_facts['cik']).zfill(10)
+    if not has_company(cik, root):
+        write_company_facts(company_facts, validators, root)
+        return sum(len(records) for concepts in company_facts.get('facts', {}).values()
+                   for body in concepts.values() for records in body['units'].values())
+
+    facts, concepts = flatten_company_facts(company_facts)
+    stored = read_facts(cik, root=root)
+    meta = read_meta(cik, root)
+
+    key = ['taxonomy', 'concept', 'unit', 'start', 'end', 'val', 'form', 'filed', 'fp', 'accn']
+    known = pd.MultiIndex.from_frame(facts[key]).isin(pd.MultiIndex.from_frame(stored[key]))
+    kept = ~pd.MultiIndex.from_frame(stored[key]).isin(pd.MultiIndex.from_frame(facts[key]))
+    merged = pd.concat([facts, stored[kept]], ignore_index=True)
+    merged = merged.sort_values(by=['taxonomy', 'concept'], kind='stable')
+
+    for taxonomy, taxonomy_concepts in meta['concepts'].items():
+        new_concepts = concepts.setdefault(taxonomy, {})
+        for concept, body in taxonomy_concepts.items():
+            if concept not in new_concepts:
+                new_concepts[concept] = body
+                continue
+            units = new_concepts[concept]['units']
+            for unit, flags in body['units'].items():
+                if unit not in units:
+                    units[unit] = flags
+                else:
+                    units[unit] = {'int': units[unit]['int'] and flags['int'], 'start': units[unit]['start'] or flags['start']}
+
+    with atomic_write(facts_path(cik, root)) as temporary:
+        merged.to_parquet(temporary, index=False, row_group_size=ROW_GROUP_SIZE)
+    meta.update({
+        'entityName': company_facts.get('entityName', meta['entityName']),
+        'concepts': concepts,
+        'validators': validators or meta.get('validators'),
+    })
+    with atomic_write(meta_path(cik, root)) as temporary, open(temporary, 'w') as file:
+        json.dump(meta, file, separators=(',', ':'))
+    return int((~known).sum())
+
+def manifest_path(root: str = STORE_ROOT) -> str:
+    return os.path.join(root, "manifest.json")
+
+def read_manifest(root: str = STORE_ROOT) -> dict:
+    """
+    Returns the latest filing known for every stored company, keyed by CIK.
+    """
+    if not os.path.exists(manifest_path(root)):
+        return {}
+    with open(manifest_path(root), 'r') as file:
+        return json.load(file)
+
+def write_manifest(manifest: dict, root: str = STORE_ROOT) -> None:
+    os.makedirs(root, exist_ok=True)
+    with atomic_write(manifest_path(root)) as temporary, open(temporary, 'w') as file:
+        json.dump(manifest, file, indent=4, sort_keys=True)
+
+def latest_filing(submissions: dict, forms: tuple = FILING_FORMS) -> dict:
+    """
+    Returns the accession number, form and filing date of the most recent filing of one of the forms
+    in a submissions document, or None if there is none.
+    """
+    recent = submissions.get('filings', {}).get('recent', {})
+    latest = None
+    for accession, form, filed in zip(recent.get('accessionNumber', []), recent.get('form', []), recent.get('filingDate', [])):
+        if form in forms and (latest is None or filed > latest['filed']):
+            latest = {'accession': accession, 'form': form, 'filed': filed}
+    return latest
+
+def read_meta(cik: str, root: str = STORE_ROOT) -> dict:
+    with open(meta_path(cik, root), 'r') as file:
+        return json.load(file)
+
+def read_facts(cik: str, concepts: list = None, taxonomy: str = None, root: str = STORE_ROOT) -> pd.DataFrame:
+    """
+    Reads facts of a company from the fact store, loading only the requested concepts.
+
+    Parameters:
+        cik (str): The CIK of the company.
+        concepts (list): The concepts to read. All concepts are read when omitted.
+        taxonomy (str): Restricts the read to one taxonomy, e.g. 'us-gaap'.
+        root (str): The root directory of the fact store.
+
+    Returns:
+        pd.DataFrame: The facts with the columns of FACT_COLUMNS. When every concept is read, the
+        columns of CATEGORY_COLUMNS are categoricals.
+    """
+    filters = []
+    if taxonomy is not None:
+        filters.append(('taxonomy', '==', taxonomy))
+    if concepts is not None:
+        filters.append(('concept', 'in', list(concepts)))
+    with instrumentation.timed('store_read_s'):
+        # Dictionary columns defeat the row group skipping of a concept filter, so only full reads use them
+        read_dictionary = CATEGORY_COLUMNS if concepts is None else None
+        facts = pd.read_parquet(facts_path(cik, root), filters=filters or None, read_dictionary=read_dictionary)
+    instrumentation.count('store_rows_read', len(facts))
+    return facts
+
+def has_accession(cik: str, accession: str, root: str = STORE_ROOT) -> bool:
+    """
+    Returns True when the stored facts of a company include values of a filing.
+    """
+    if not has_company(cik, root):
+        return False
+    filed = pd.read_parquet(facts_path(cik, root), columns=['accn'], filters=[('accn', '==', accession)])
+    return len(filed) > 0
+
+def migrate_json_cache(root: str = STORE_ROOT) -> list:
+    """
+    Converts the JSON caches written by earlier versions ({symbol}.json) into the fact store.
+    Each converted file is removed, and its modification time is kept so the refresh schedule
+    does not change.
+
+    Parameters:
+        root (str): The directory holding the JSON caches and the fact store.
+
+    Returns:
+        list: The CIKs that were migrated.
+    """
+    migrated = []
+    if not os.path.isdir(root):
+        return migrated
+    for name in sorted(os.listdir(root)):
+        file_path = os.path.join(root, name)
+        if not name.endswith('.json') or name == "manifest.json" or not os.path.isfile(file_path):
+            continue
+        with open(file_path, 'r') as file:
+            company_facts = json.load(file)
+        if 'cik' not in company_facts:
+            continue
+
+        validators = None
+        if os.path.exists(f"{file_path}.meta"):
+            with open(f"{file_path}.meta", 'r') as file:
+                validators = json.load(file)
+            os.remove(f"{file_path}.meta")
+
+        cik = write_company_facts(company_facts, validators, root)
+        modified = os.path.getmtime(file_path)
+        os.utime(facts_path(cik, root), (modified, modified))
+        os.remove(file_path)
+        migrated.append(cik)
+    return migrated
+
+class CompanyFacts(Mapping):
+    """
+    A read-only view of a company in the fact store that behaves like the companyfacts document.
+    Concepts are loaded from the Parquet table only when they are accessed.
+
+    Parameters:
+        cik (str): The CIK of the company.
+        root (str): The root directory of the fact store.
+    """
+    def __init__(self, cik: str, root: str = STORE_ROOT):
+        self.cik = str(cik).zfill(10)
+        self.root = root
+        self.version = store_version(self.cik, root)
+        self.meta = read_meta(self.cik, root)
+        self._document = {
+            'cik': self.meta['cik'],
+            'entityName': self.meta['entityName'],
+            'facts': {taxonomy: _TaxonomyFacts(self, taxonomy) for taxonomy in self.meta['concepts']},
+        }
+
+    def __getitem__(self, key):
+        return self._document[key]
+
+    def __iter__(self):
+        return iter(self._document)
+
+    def __len__(self):
+        return len(self._document)
+
+    def concept_frame(self, fact: str, taxonomy: str = 'us-gaap', unit: str = None) -> Tuple[pd.DataFrame, str]:
+        """
+        Returns the values of a concept in one unit as a frame shaped like
+        pd.DataFrame(company_facts['facts'][taxonomy][fact]['units'][unit]).
+
+        Parameters:
+            fact (str): The concept.
+            taxonomy (str): The taxonomy of the concept.
+            unit (str): The unit to read, the first reported unit by default.
+
+        Returns:
+            Tuple[pd.DataFrame, str]: The values and their unit.
+        """
+        units = self.meta['concepts'][taxonomy][fact]['units']
+        unit = unit or next(iter(units))
+        facts = read_facts(self.cik, [fact], taxonomy, self.root)
+        facts = facts[facts['unit'] == unit].drop(columns=['taxonomy', 'concept', 'unit'])
+        return _as_records_frame(facts, units[unit]), unit
+
+def _as_records_frame(facts: pd.DataFrame, unit_meta: dict) -> pd.DataFrame:
+    """
+    Restores the columns and value dtype a frame built from the original JSON records would have.
+    """
+    facts = facts.reset_index(drop=True)
+    if not unit_meta['start']:
+        facts = facts.drop(columns=['start'])
+    if facts['frame'].isna().all():
+        facts = facts.drop(columns=['frame'])
+    if unit_meta['int']:
+        facts['val'] = facts['val'].astype('int64')
+    return facts
+
+class _TaxonomyFacts(Mapping):
+    def __init__(self, company: CompanyFacts, taxonomy: str):
+        self.company = company
+        self.taxonomy = taxonomy
+        self.concepts = company.meta['concepts'][taxonomy]
+
+    def __getitem__(self, concept):
+        body = self.concepts[concept]
+        facts = read_facts(self.company.cik, [concept], self.taxonomy, self.company.root)
+        units = {}
+        for unit, unit_meta in body['units'].items():
+            records = _as_records_frame(facts[facts['unit'] == unit].drop(columns=['taxonomy', 'concept', 'unit']), unit_meta)
+            for column in ['start', 'end', 'filed']:
+                if column in records:
+                    records[column] = records[column].dt.strftime('%Y-%m-%d')
+            units[unit] = [{key: value for key, value in record.items() if not pd.isna(value)} for record in records.to_dict('records')]
+        return {'label': body['label'], 'description': body['description'], 'units': units}
+
+    def __iter__(self):
+        return iter(self.concepts)
+
+    def __len__(self):
+        return len(self.concepts)
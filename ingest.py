@@ -0,0 +1,145 @@
+"""
+Loads SEC's nightly bulk archives into the local caches, so facts of any filer can be read without
+network calls.
+
+    python ingest.py --companyfacts companyfacts.zip --submissions submissions.zip
+
+The archives are read member by member straight from the zip file, nothing is extracted to disk.
+"""
+import os
+import json
+import argparse
+import zipfile
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import fact_store
+
+SUBMISSIONS_DIR = "Submssions"
+
+def _batches(names: list, size: int):
+    for start in range(0, len(names), size):
+        yield names[start:start + size]
+
+def _ingest_companyfacts_batch(zip_path: str, names: list, root: str) -> list:
+    """
+    Writes a batch of companyfacts members to the fact store. Runs in the worker processes, each
+    opening the archive itself and decoding one member at a time.
+    """
+    results = []
+    with zipfile.ZipFile(zip_path) as archive:
+        for name in names:
+            try:
+                with archive.open(name) as member:
+                    company_facts = json.load(member)
+                if 'cik' not in company_facts or not company_facts.get('facts'):
+                    results.append((name, None, "No facts"))
+                    continue
+                results.append((name, fact_store.write_company_facts(company_facts, root=root), None))
+            except Exception as e:
+                results.append((name, None, str(e)))
+    return results
+
+def _ingest_submissions_batch(zip_path: str, names: list, directory: str, root: str) -> list:
+    """
+    Copies a batch of submissions members to the submissions cache and returns the latest filing of
+    every company.
+    """
+    results = []
+    with zipfile.ZipFile(zip_path) as archive:
+        for name in names:
+            try:
+                with archive.open(name) as member:
+                    content = member.read()
+                cik = name[len("CIK"):len("CIK") + 10]
+                with open(os.path.join(directory, f"CIK{cik}_submissions.json"), 'wb') as file:
+                    file.write(content)
+                latest = None
+                if fact_store.has_company(cik, root):
+                    latest = fact_store.latest_filing(json.loads(content))
+                results.append((name, cik, latest, None))
+            except Exception as e:
+                results.append((name, None, None, str(e)))
+    return results
+
+def ingest_companyfacts(zip_path: str, root: str = fact_store.STORE_ROOT, max_workers: int = None, batch_size: int = 64) -> dict:
+    """
+    Loads every company of SEC's companyfacts.zip into the fact store.
+
+    Parameters:
+        zip_path (str): The path of companyfacts.zip.
+        root (str): The root directory of the fact store.
+        max_workers (int): The number of worker processes. Defaults to the number of CPUs.
+        batch_size (int): The number of members a worker decodes before returning, which bounds
+                          the memory held by each worker to one company at a time.
+
+    Returns:
+        dict: The number of companies loaded and the error message of every member that failed.
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        names = [info.filename for info in archive.infolist() if info.filename.endswith('.json')]
+
+    os.makedirs(root, exist_ok=True)
+    loaded, errors = 0, {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_ingest_companyfacts_batch, zip_path, batch, root) for batch in _batches(names, batch_size)]
+        for future in futures:
+            for name, cik, error in future.result():
+                if cik is not None:
+                    loaded += 1
+                elif error != "No facts":
+                    errors[name] = error
+    return {'loaded': loaded, 'errors': errors}
+
+def ingest_submissions(zip_path: str, directory: str = SUBMISSIONS_DIR, root: str = fact_store.STORE_ROOT,
+                       max_workers: int = None, batch_size: int = 256) -> dict:
+    """
+    Loads SEC's submissions.zip into the submissions cache and records the latest filing of every
+    company in the fact store in its manifest, so refresh_company_facts only downloads companies
+    that file after the archive was built. Ingest companyfacts.zip first.
+
+    Parameters:
+        zip_path (str): The path of submissions.zip.
+        directory (str): The submissions cache directory.
+        root (str): The root directory of the fact store.
+        max_workers (int): The number of worker processes. Defaults to the number of CPUs.
+        batch_size (int): The number of members a worker handles per task.
+
+    Returns:
+        dict: The number of companies loaded and the error message of every member that failed.
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        # Members named CIK##########-submissions-###.json only hold older filings
+        names = [info.filename for info in archive.infolist()
+                 if info.filename.endswith('.json') and '-submissions-' not in info.filename]
+
+    os.makedirs(directory, exist_ok=True)
+    manifest = fact_store.read_manifest(root)
+    refreshed = datetime.now().isoformat(timespec='seconds')
+    loaded, errors = 0, {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_ingest_submissions_batch, zip_path, batch, directory, root) for batch in _batches(names, batch_size)]
+        for future in futures:
+            for name, cik, latest, error in future.result():
+                if error is not None:
+                    errors[name] = error
+                    continue
+                loaded += 1
+                if latest is not None:
+                    manifest[cik] = {**latest, 'refreshed': refreshed}
+    fact_store.write_manifest(manifest, root)
+    return {'loaded': loaded, 'errors': errors}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load SEC bulk archives into the local caches.")
+    parser.add_argument("--companyfacts", help="Path of companyfacts.zip")
+    parser.add_argument("--submissions", help="Path of submissions.zip")
+    parser.add_argument("--root", default=fact_store.STORE_ROOT, help="Root directory of the fact store")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args()
+
+    if args.companyfacts:
+        summary = ingest_companyfacts(args.companyfacts, args.root, args.workers)
+        print(f"companyfacts: {summary['loaded']} companies loaded, {len(summary['errors'])} errors")
+    if args.submissions:
+        summary = ingest_submissions(args.submissions, root=args.root, max_workers=args.workers)
+        print(f"submissions: {summary['loaded']} companies loaded, {len(summary['errors'])} errors")
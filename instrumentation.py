@@ -0,0 +1,241 @@
+"""
+Opt-in timings and counters for the public functions of Functions.py.
+
+    import instrumentation
+    instrumentation.enable("run.jsonl")   # the export file is optional
+    read_portfolio(data)
+    instrumentation.report()
+
+Every instrumented call records its duration, the rows it returned and the counters raised while it
+ran: HTTP requests, statuses, retries, bytes downloaded, rate-limit waits, cache hits and misses and
+the seconds spent in yfinance, JSON parsing and the fact store. Counters raised by nested calls are
+included in their callers, and so are those raised in worker threads started through bind().
+
+While disabled, an instrumented function costs one flag check per call and counters cost nothing.
+Calls made in worker processes are not recorded: forked children start disabled.
+"""
+import os
+import functools
+import json
+import threading
+import time
+from collections import deque
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_records = deque(maxlen=10000)
+_functions = {}
+_totals = {}
+_export = None
+
+def enable(export_path: str = None, max_records: int = 10000) -> None:
+    """
+    Starts recording.
+
+    Parameters:
+        export_path (str): A file every finished call is appended to as one JSON line.
+        max_records (int): The number of most recent calls kept in memory by records().
+    """
+    global _enabled, _export, _records
+    with _lock:
+        if _export is not None:
+            _export.close()
+        _export = open(export_path, 'a') if export_path else None
+        if _records.maxlen != max_records:
+            _records = deque(_records, maxlen=max_records)
+        _enabled = True
+
+def disable() -> None:
+    """
+    Stops recording and closes the export file. What was recorded stays available.
+    """
+    global _enabled, _export
+    with _lock:
+        _enabled = False
+        if _export is not None:
+            _export.close()
+            _export = None
+
+def _disable_in_child() -> None:
+    """
+    Forked workers inherit the flag, the export file and the stack of the forking thread. Their calls
+    would be exported without reaching report() in the parent, so recording stops in the child. The
+    export file is left open, closing it would flush the buffer of the parent a second time.
+    """
+    global _enabled, _export, _lock, _local
+    _enabled = False
+    _export = None
+    _lock = threading.Lock()
+    _local = threading.local()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_disable_in_child)
+
+def is_enabled() -> bool:
+    return _enabled
+
+def reset() -> None:
+    """
+    Forgets every recorded call and counter.
+    """
+    with _lock:
+        _records.clear()
+        _functions.clear()
+        _totals.clear()
+
+def count(name: str, amount: float = 1) -> None:
+    """
+    Adds amount to a counter of the running instrumented call and to the totals.
+    """
+    if not _enabled:
+        return
+    stack = getattr(_local, 'stack', None)
+    with _lock:
+        _totals[name] = _totals.get(name, 0) + amount
+        if stack:
+            counters = stack[-1]['counters']
+            counters[name] = counters.get(name, 0) + amount
+
+class timed:
+    """
+    Adds the seconds spent in a with block to a counter.
+
+        with instrumentation.timed('yfinance_s'):
+            info = ticker.info
+    """
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if _enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            count(self.name, time.perf_counter() - self.start)
+        return False
+
+def bind(function):
+    """
+    Returns function bound to the running instrumented call, so the counters it raises in a worker
+    thread are included in that call. Returns function itself while disabled.
+    """
+    if not _enabled:
+        return function
+    stack = getattr(_local, 'stack', None)
+    if not stack:
+        return function
+    parent = stack[-1]
+
+    @functools.wraps(function)
+    def bound(*args, **kwargs):
+        own = getattr(_local, 'stack', None)
+        _local.stack = [parent]
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.stack = own
+    return bound
+
+def _rows(result):
+    """
+    Returns the number of rows of a frame result, of the frames of a tuple result or the length of a dict.
+    """
+    if hasattr(result, 'shape') and len(result.shape) > 0:
+        return result.shape[0]
+    if isinstance(result, tuple):
+        rows = [item.shape[0] for item in result if hasattr(item, 'shape') and len(item.shape) > 0]
+        return sum(rows) if rows else None
+    if isinstance(result, dict):
+        return len(result)
+    return None
+
+def _finish(record: dict, parent: dict) -> None:
+    with _lock:
+        if parent is not None:
+            for name, amount in record['counters'].items():
+                parent['counters'][name] = parent['counters'].get(name, 0) + amount
+
+        summary = _functions.setdefault(record['function'], {'calls': 0, 'errors': 0, 'total_s': 0.0, 'max_s': 0.0,
+                                                             'rows': 0, 'counters': {}})
+        summary['calls'] += 1
+        summary['errors'] += record['error'] is not None
+        summary['total_s'] += record['duration_s']
+        summary['max_s'] = max(summary['max_s'], record['duration_s'])
+        summary['rows'] += record['rows'] or 0
+        for name, amount in record['counters'].items():
+            summary['counters'][name] = summary['counters'].get(name, 0) + amount
+
+        _records.append(record)
+        if _export is not None:
+            _export.write(json.dumps(record, default=str) + "\n")
+            _export.flush()
+
+def instrument(function):
+    """
+    Records every call of function while instrumentation is enabled.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return function(*args, **kwargs)
+
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        parent = stack[-1] if stack else None
+        record = {'function': function.__name__, 'start': time.time(), 'duration_s': None,
+                  'thread': threading.current_thread().name, 'parent': parent['function'] if parent else None,
+                  'rows': None, 'error': None, 'counters': {}}
+        stack.append(record)
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+            record['rows'] = _rows(result)
+            return result
+        except Exception as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record['duration_s'] = time.perf_counter() - start
+            stack.pop()
+            _finish(record, parent)
+    return wrapper
+
+def records() -> list:
+    """
+    Returns the most recent calls, oldest first, each with its function, start time, duration, thread,
+    calling function, rows returned, error message and counters.
+    """
+    with _lock:
+        return [dict(record, counters=dict(record['counters'])) for record in _records]
+
+def report() -> dict:
+    """
+    Returns the recorded calls aggregated by function, and the totals of every counter.
+
+    Returns:
+        dict: 'functions' maps every instrumented function to its calls, errors, total, mean and
+        maximum seconds, rows returned and counters. 'counters' holds the totals of every counter.
+    """
+    with _lock:
+        functions = {}
+        for name, summary in _functions.items():
+            functions[name] = {**summary, 'mean_s': summary['total_s'] / summary['calls'],
+                               'counters': dict(summary['counters'])}
+        return {'functions': functions, 'counters': dict(_totals)}
+
+def export_jsonl(file_path: str) -> int:
+    """
+    Writes the calls kept in memory to a JSON lines file and returns how many were written.
+    """
+    calls = records()
+    with open(file_path, 'w') as file:
+        for record in calls:
+            file.write(json.dumps(record, default=str) + "\n")
+    return len(calls)
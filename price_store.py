@@ -0,0 +1,104 @@
+import os
+from datetime import datetime, timedelta
+from typing import Callable
+import numpy as np
+import pandas as pd
+from fact_store import atomic_write
+
+PRICE_ROOT = "priceHistory"
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+OVERLAP_DAYS = 10
+
+def yfinance_fetcher(symbol: str, start: str = None) -> pd.DataFrame:
+    """
+    Downloads adjusted daily bars with yfinance, from start or for the whole history.
+    """
+    import yfinance as yf
+    ticker = yf.Ticker(symbol)
+    if start is None:
+        return ticker.history(period="max", interval='1d', actions=False)
+    return ticker.history(start=start, interval='1d', actions=False)
+
+def history_path(symbol: str, root: str = PRICE_ROOT) -> str:
+    return os.path.join(root, f"{symbol.upper()}.parquet")
+
+def _write_history(history: pd.DataFrame, symbol: str, root: str) -> None:
+    os.makedirs(root, exist_ok=True)
+    with atomic_write(history_path(symbol, root)) as temporary:
+        history.to_parquet(temporary)
+
+def update_price_history(symbol: str, fetcher: Callable = None, root: str = PRICE_ROOT, max_age_hours: float = 12) -> pd.DataFrame:
+    """
+    Brings the stored daily history of a symbol up to date, fetching only the bars after the last
+    stored date. The last days before it are fetched again and compared with the stored prices: when
+    a split or dividend changed the adjusted prices, the whole history is fetched again.
+
+    Parameters:
+        symbol (str): The stock ticker symbol.
+        fetcher (Callable): fetcher(symbol, start) returning daily bars from start, or the whole history
+                            when start is None. Defaults to yfinance.
+        root (str): The directory of the price store.
+        max_age_hours (float): A history updated more recently than this is returned as stored.
+
+    Returns:
+        pd.DataFrame: The complete stored history.
+    """
+    fetcher = fetcher or yfinance_fetcher
+    file_path = history_path(symbol, root)
+
+    if not os.path.exists(file_path):
+        history = fetcher(symbol, None)[PRICE_COLUMNS]
+        _write_history(history, symbol, root)
+        return history
+
+    history = pd.read_parquet(file_path)
+    file_mod_time = datetime.fromtimestamp(os.path.getmtime(file_path))
+    if datetime.now() - file_mod_time < timedelta(hours=max_age_hours) or len(history) == 0:
+        return history
+
+    start = (history.index[-1] - timedelta(days=OVERLAP_DAYS)).strftime('%Y-%m-%d')
+    recent = fetcher(symbol, start)[PRICE_COLUMNS]
+
+    # The last stored bar may have been taken during the trading day, it is only replaced
+    overlap = history.index[:-1].intersection(recent.index)
+    adjusted = len(overlap) > 0 and not np.allclose(recent.loc[overlap, 'Close'], history.loc[overlap, 'Close'], rtol=1e-6)
+    if adjusted:
+        history = fetcher(symbol, None)[PRICE_COLUMNS]
+    else:
+        history = pd.concat([history[history.index < recent.index.min()] if len(recent) else history, recent])
+        history = history[~history.index.duplicated(keep='last')].sort_index()
+
+    _write_history(history, symbol, root)
+    return history
+
+def get_price_history(symbol: str, start: str = None, end: str = None, fetcher: Callable = None, root: str = PRICE_ROOT,
+                      update: bool = True) -> pd.DataFrame:
+    """
+    Returns the daily bars of a symbol between start and end from the local price store.
+
+    Parameters:
+        symbol (str): The stock ticker symbol.
+        start, end (str): The first and last date of the range, e.g. '2020-01-01'. Both are optional.
+        fetcher (Callable): The function fetching missing bars, see update_price_history.
+        root (str): The directory of the price store.
+        update (bool): Fetches bars after the last stored date first. When False no network call is made.
+
+    Returns:
+        pd.DataFrame: Open, High, Low, Close and Volume indexed by date.
+    """
+    if update:
+        history = update_price_history(symbol, fetcher, root)
+    else:
+        history = pd.read_parquet(history_path(symbol, root))
+    return history.loc[start:end]
+
+def get_close_prices(symbols: list, start: str = None, end: str = None, fetcher: Callable = None, root: str = PRICE_ROOT,
+                     update: bool = True) -> pd.DataFrame:
+    """
+    Returns the closing prices of many symbols as one frame with a column per symbol.
+    """
+    closes = {}
+    for symbol in symbols:
+        history = get_price_history(symbol, None, None, fetcher, root, update)
+        closes[symbol] = history['Close'].set_axis(history.index.tz_localize(None) if history.index.tz is not None else history.index)
+    return pd.DataFrame(closes).loc[start:end]
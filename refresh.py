@@ -0,0 +1,200 @@
+"""
+Refreshes the local caches of a portfolio and its watchlists without a notebook, so notebooks only
+read warm caches.
+
+    python refresh.py                                   # portfolio.csv, once
+    python refresh.py --watchlists tech.csv energy.csv --every 24 --log-file refresh.log
+
+Run it from cron or a scheduled task, or keep it running with --every. The ticker index, the
+submissions and company facts of every company and the daily price history of every symbol are
+refreshed in batches. The portfolio comes before the watchlists, and within each list the symbols
+with nothing cached come first. SEC requests go through the shared rate-limited EDGAR client.
+"""
+import os
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import fact_store
+import price_store
+import instrumentation
+from Functions import resolve_many, refresh_company_facts
+
+PORTFOLIO_FILE = "portfolio.csv"
+SUMMARY_COUNTERS = ['http_requests', 'http_retries', 'bytes_downloaded', 'rate_limit_wait_s']
+
+logger = logging.getLogger("refresh")
+
+def read_watchlists(paths: list) -> list:
+    """
+    Returns the symbols of watchlist files with a 'symbol' column, in order and without duplicates.
+    Files that do not exist are skipped.
+    """
+    symbols = []
+    for path in paths:
+        if not os.path.exists(path):
+            logger.warning("Watchlist %s not found", path)
+            continue
+        symbols += [symbol.strip().upper() for symbol in pd.read_csv(path)['symbol'].dropna().astype(str)]
+    return list(dict.fromkeys(symbols))
+
+def _prioritize(lists: list, cached) -> list:
+    """
+    Returns the items of every list, list after list, with the items of each list that have nothing
+    cached before the others. Items already taken from an earlier list are dropped.
+    """
+    ordered = []
+    for items in lists:
+        ordered += [item for item in items if not cached(item)] + [item for item in items if cached(item)]
+    return list(dict.fromkeys(ordered))
+
+def _batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def refresh_facts(ciks: list, batch_size: int = 50, max_workers: int = 8) -> pd.DataFrame:
+    """
+    Refreshes the submissions and company facts of companies in batches, see refresh_company_facts.
+
+    Returns:
+        pd.DataFrame: The status of every CIK.
+    """
+    results = []
+    for number, batch in enumerate(_batches(ciks, batch_size), 1):
+        result = refresh_company_facts(batch, max_workers=max_workers)
+        counts = result['status'].value_counts().to_dict()
+        logger.info("Facts batch %d: %d companies, %s", number, len(batch), counts)
+        results.append(result)
+    if not results:
+        return pd.DataFrame(columns=['cik', 'status', 'accession', 'new_values', 'error'])
+    return pd.concat(results, ignore_index=True)
+
+def refresh_prices(symbols: list, batch_size: int = 50, max_workers: int = 4, max_age_hours: float = 12,
+                   root: str = price_store.PRICE_ROOT) -> pd.DataFrame:
+    """
+    Brings the stored price history of symbols up to date in batches, see update_price_history.
+
+    Returns:
+        pd.DataFrame: One row per symbol with its status ('updated' or 'error'), the date of its
+        last bar and the error message if any.
+    """
+    def update(symbol):
+        try:
+            history = price_store.update_price_history(symbol, root=root, max_age_hours=max_age_hours)
+            last = history.index[-1] if len(history) else None
+            return {'symbol': symbol, 'status': 'updated', 'last_bar': last}
+        except Exception as e:
+            return {'symbol': symbol, 'status': 'error', 'error': f"An error occurred while updating {symbol}: {e}"}
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for number, batch in enumerate(_batches(symbols, batch_size), 1):
+            batch_results = list(executor.map(instrumentation.bind(update), batch))
+            errors = sum(result['status'] == 'error' for result in batch_results)
+            logger.info("Prices batch %d: %d symbols, %d errors", number, len(batch), errors)
+            results += batch_results
+    return pd.DataFrame(results, columns=['symbol', 'status', 'last_bar', 'error'])
+
+def run(portfolio: str = PORTFOLIO_FILE, watchlists: list = None, batch_size: int = 50, max_workers: int = 8,
+        price_workers: int = 4, max_age_hours: float = 12, prices: bool = True) -> dict:
+    """
+    Refreshes the ticker index, the submissions and company facts and the price history of every
+    symbol of the portfolio and the watchlists.
+
+    Parameters:
+        portfolio (str): The portfolio file, refreshed first.
+        watchlists (list): Additional watchlist files with a 'symbol' column.
+        batch_size (int): The number of companies or symbols refreshed per batch.
+        max_workers (int): The number of companies refreshed at the same time. SEC requests are
+                           rate limited by the EDGAR client whatever the number.
+        price_workers (int): The number of price histories downloaded at the same time.
+        max_age_hours (float): Price histories updated more recently than this are left as stored.
+        prices (bool): Also refreshes the price histories.
+
+    Returns:
+        dict: The number of symbols, the unresolved symbols, the facts and prices status frames,
+        the request counters and the elapsed seconds.
+    """
+    start = time.perf_counter()
+    was_enabled = instrumentation.is_enabled()
+    if not was_enabled:
+        instrumentation.reset()
+        instrumentation.enable()
+    try:
+        lists = [read_watchlists([path]) for path in [portfolio, *(watchlists or [])]]
+        symbols = list(dict.fromkeys(symbol for watchlist in lists for symbol in watchlist))
+        logger.info("Refreshing %d symbols", len(symbols))
+
+        ciks = resolve_many(symbols)
+        unresolved = [symbol for symbol, cik in ciks.items() if cik is None]
+        if unresolved:
+            logger.warning("No CIK for %s", ", ".join(unresolved))
+        cik_lists = [[ciks[symbol] for symbol in watchlist if ciks[symbol] is not None] for watchlist in lists]
+        facts = refresh_facts(_prioritize(cik_lists, fact_store.has_company), batch_size, max_workers)
+
+        price_results = pd.DataFrame(columns=['symbol', 'status', 'last_bar', 'error'])
+        if prices:
+            ordered = _prioritize(lists, lambda symbol: os.path.exists(price_store.history_path(symbol)))
+            price_results = refresh_prices(ordered, batch_size, price_workers, max_age_hours)
+
+        counters = instrumentation.report()['counters']
+    finally:
+        if not was_enabled:
+            instrumentation.disable()
+
+    summary = {
+        'symbols': len(symbols),
+        'unresolved': unresolved,
+        'facts': facts,
+        'prices': price_results,
+        'counters': {name: counters.get(name, 0) for name in SUMMARY_COUNTERS},
+        'elapsed_s': time.perf_counter() - start,
+    }
+    log_summary(summary)
+    return summary
+
+def log_summary(summary: dict) -> None:
+    facts, prices = summary['facts'], summary['prices']
+    logger.info("Done in %.1f s: %d symbols, %d without CIK", summary['elapsed_s'], summary['symbols'],
+                len(summary['unresolved']))
+    logger.info("Facts: %s, %d new values", facts['status'].value_counts().to_dict(),
+                int(facts['new_values'].fillna(0).sum()))
+    logger.info("Prices: %s", prices['status'].value_counts().to_dict())
+    counters = summary['counters']
+    logger.info("SEC requests: %d, %d retries, %.1f MB downloaded, %.1f s waiting on the rate limit",
+                counters['http_requests'], counters['http_retries'], counters['bytes_downloaded'] / 2**20,
+                counters['rate_limit_wait_s'])
+    for _, row in pd.concat([facts.rename(columns={'cik': 'name'}), prices.rename(columns={'symbol': 'name'})]).iterrows():
+        if row['status'] == 'error':
+            logger.error("%s: %s", row['name'], row['error'])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the caches of the portfolio and watchlists.")
+    parser.add_argument("--portfolio", default=PORTFOLIO_FILE, help="Portfolio file, refreshed first")
+    parser.add_argument("--watchlists", nargs="*", default=[], help="Additional watchlist files with a symbol column")
+    parser.add_argument("--batch-size", type=int, default=50, help="Companies or symbols refreshed per batch")
+    parser.add_argument("--workers", type=int, default=8, help="Companies refreshed at the same time")
+    parser.add_argument("--price-workers", type=int, default=4, help="Price histories downloaded at the same time")
+    parser.add_argument("--max-age-hours", type=float, default=12, help="Age under which a price history is kept")
+    parser.add_argument("--no-prices", action="store_true", help="Skip the price histories")
+    parser.add_argument("--every", type=float, help="Keep running and refresh every this many hours")
+    parser.add_argument("--log-file", help="Also append the log to this file")
+    args = parser.parse_args()
+
+    handlers = [logging.StreamHandler()]
+    if args.log_file:
+        handlers.append(logging.FileHandler(args.log_file))
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", handlers=handlers)
+
+    while True:
+        try:
+            run(args.portfolio, args.watchlists, args.batch_size, args.workers, args.price_workers,
+                args.max_age_hours, not args.no_prices)
+        except Exception:
+            logger.exception("Refresh failed")
+            if args.every is None:
+                raise
+        if args.every is None:
+            break
+        time.sleep(args.every * 3600)
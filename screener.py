@@ -0,0 +1,207 @@
+"""
+Screens every company of the fact store with filter expressions over precomputed indexes.
+
+    build_screen_index()
+    screen("Revenues_annual_growth > 0.2 and "
+           "NetCashProvidedByUsedInOperatingActivities_annual - PaymentsToAcquirePropertyPlantAndEquipment_annual > 0")
+
+The index holds, per (concept, CIK), the latest annual and quarterly values and the trailing twelve
+months, derived with get_all_facts so they match get_fact. Expressions name a concept and a metric
+joined by an underscore, e.g. Revenues_ttm, and are evaluated with DataFrame.query.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import fact_store
+
+INDEX_FILE = "screen_index.parquet"
+METRICS = ['annual', 'annual_prev', 'annual_growth', 'annual_date',
+           'quarter', 'quarter_date', 'ttm', 'ttm_prev', 'ttm_growth']
+INDEX_COLUMNS = ['concept', 'cik', 'entityName', 'version', 'instant', *METRICS]
+# Four consecutive quarter ends span about 273 days, consecutive years about 365
+TTM_MAX_SPAN_DAYS = 300
+YEAR_DAYS = (330, 400)
+ROW_GROUP_SIZE = 65536
+
+def index_path(root: str = fact_store.STORE_ROOT) -> str:
+    return os.path.join(root, INDEX_FILE)
+
+def _long_values(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turns a wide frame of get_all_facts into concept, end and val rows sorted by concept and end.
+    """
+    long = data.rename_axis('end').reset_index().melt(id_vars='end', var_name='concept', value_name='val')
+    long = long.dropna(subset=['val'])
+    long['val'] = long['val'].astype('float64')
+    return long.sort_values(['concept', 'end'], kind='stable').reset_index(drop=True)
+
+def _growth(current: pd.Series, previous: pd.Series) -> pd.Series:
+    growth = (current - previous) / previous.abs()
+    return growth.replace([np.inf, -np.inf], np.nan)
+
+def _annual_metrics(annual_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the latest annual value of every concept, the value of the year before it and the growth
+    between the two. Growth is left empty when the two values are not a year apart.
+    """
+    long = _long_values(annual_data)
+    groups = long.groupby('concept', sort=False)
+    previous_end = groups['end'].shift(1)
+    long['annual_prev'] = groups['val'].shift(1).where((long['end'] - previous_end).dt.days.between(*YEAR_DAYS))
+    latest = long.groupby('concept', sort=False).tail(1).set_index('concept')
+    return pd.DataFrame({
+        'annual': latest['val'],
+        'annual_prev': latest['annual_prev'],
+        'annual_growth': _growth(latest['val'], latest['annual_prev']),
+        'annual_date': latest['end'],
+    })
+
+def _quarter_metrics(quarter_data: pd.DataFrame, instant: set) -> pd.DataFrame:
+    """
+    Returns the latest quarterly value of every concept and the sum of its last four quarters, the
+    four quarters before them and the growth between the two. A sum is only kept when its quarters
+    are consecutive. Point-in-time concepts have no trailing sum.
+    """
+    long = _long_values(quarter_data)
+    groups = long.groupby('concept', sort=False)
+    rolling = groups['val'].rolling(4).sum().reset_index(level=0, drop=True)
+    consecutive = (long['end'] - groups['end'].shift(3)).dt.days <= TTM_MAX_SPAN_DAYS
+    long['ttm'] = rolling.where(consecutive & ~long['concept'].isin(instant))
+    year_before = (long['end'] - groups['end'].shift(4)).dt.days.between(*YEAR_DAYS)
+    long['ttm_prev'] = long.groupby('concept', sort=False)['ttm'].shift(4).where(year_before)
+    latest = long.groupby('concept', sort=False).tail(1).set_index('concept')
+    return pd.DataFrame({
+        'quarter': latest['val'],
+        'quarter_date': latest['end'],
+        'ttm': latest['ttm'],
+        'ttm_prev': latest['ttm_prev'],
+        'ttm_growth': _growth(latest['ttm'], latest['ttm_prev']),
+    })
+
+def _company_index(cik: str, root: str, concepts: list, annual_form: str, quarter_form: str) -> pd.DataFrame:
+    """
+    Builds the index rows of one company. Runs in the worker processes of build_screen_index.
+    """
+    from Functions import get_all_facts
+    company_facts = fact_store.CompanyFacts(cik, root)
+    quarter_data, annual_data, specialCase = get_all_facts(company_facts, annual_form, quarter_form,
+                                                          formatted=False, concepts=concepts)
+    instant = {concept for concept, _ in specialCase}
+    rows = _annual_metrics(annual_data).join(_quarter_metrics(quarter_data, instant), how='outer')
+    rows = rows.rename_axis('concept').reset_index()
+    rows['cik'] = company_facts.cik
+    rows['entityName'] = company_facts['entityName']
+    rows['version'] = company_facts.version
+    rows['instant'] = rows['concept'].isin(instant)
+    return rows.reindex(columns=INDEX_COLUMNS)
+
+def build_screen_index(root: str = fact_store.STORE_ROOT, concepts: list = None, annual_form: str = "10-K",
+                       quarter_form: str = "10-Q", max_workers: int = None) -> pd.DataFrame:
+    """
+    Builds the screening index of every company in the fact store. Companies whose facts did not
+    change since the last build are taken from the existing index.
+
+    Parameters:
+        root (str): The root directory of the fact store.
+        concepts (list): The us-gaap concepts to index. Every concept is indexed when omitted.
+        annual_form, quarter_form (str): The forms annual and quarterly values are taken from.
+        max_workers (int): The number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        pd.DataFrame: The index, one row per (concept, CIK). Companies that could not be indexed are
+        listed with their error message in index.attrs['errors'].
+    """
+    params = {'concepts': sorted(concepts) if concepts is not None else None,
+              'annual_form': annual_form, 'quarter_form': quarter_form}
+    ciks = fact_store.list_companies(root)
+    versions = {cik: fact_store.store_version(cik, root) for cik in ciks}
+
+    kept = pd.DataFrame(columns=INDEX_COLUMNS)
+    if os.path.exists(index_path(root)):
+        existing = pd.read_parquet(index_path(root))
+        if existing.attrs.get('params') == params:
+            current = existing['version'].to_numpy() == existing['cik'].map(versions).to_numpy()
+            kept = existing[current]
+    indexed = set(kept['cik'])
+    stale = [cik for cik in ciks if cik not in indexed]
+
+    frames, errors = [kept], {}
+    if stale:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {cik: executor.submit(_company_index, cik, root, concepts, annual_form, quarter_form) for cik in stale}
+            for cik, future in futures.items():
+                try:
+                    frames.append(future.result())
+                except Exception as e:
+                    errors[cik] = str(e)
+
+    frames = [frame for frame in frames if len(frame)]
+    index = pd.concat(frames, ignore_index=True) if frames else kept
+    index = index.sort_values(['concept', 'cik'], kind='stable').reset_index(drop=True)
+    index.attrs['params'] = params
+    os.makedirs(root, exist_ok=True)
+    with fact_store.atomic_write(index_path(root)) as temporary:
+        index.to_parquet(temporary, row_group_size=ROW_GROUP_SIZE)
+    index.attrs['errors'] = errors
+    return index
+
+def _referenced_columns(expression: str) -> list:
+    """
+    Returns the (concept, metric) pairs named in an expression, in order of appearance.
+    """
+    metrics = '|'.join(sorted(METRICS, key=len, reverse=True))
+    return list(dict.fromkeys(re.findall(rf'\b(\w+?)_({metrics})\b', expression)))
+
+def screen(expression: str, symbols: list = None, ciks: list = None, columns: list = None,
+           root: str = fact_store.STORE_ROOT, index: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Returns the companies matching a filter expression, e.g. "Revenues_annual_growth > 0.2".
+
+    Expressions combine {concept}_{metric} columns with the operators of DataFrame.query, where the
+    metric is one of METRICS:
+        annual, annual_prev, annual_growth, annual_date: the latest annual value, the value of the
+            year before and the growth between them.
+        quarter, quarter_date: the latest quarterly value.
+        ttm, ttm_prev, ttm_growth: the sum of the last four quarters, of the four before them and the
+            growth between them. Point-in-time concepts such as Assets have no trailing sum.
+    Companies that do not report a concept have empty values, which fail every comparison.
+
+    Parameters:
+        expression (str): The filter expression.
+        symbols (list): Restricts the screen to these stock ticker symbols.
+        ciks (list): Restricts the screen to these CIKs.
+        columns (list): Additional {concept}_{metric} columns to return.
+        root (str): The root directory of the fact store, which holds the index.
+        index (pd.DataFrame): An index returned by build_screen_index, read from root when omitted.
+
+    Returns:
+        pd.DataFrame: The matching companies indexed by CIK, with their name, symbol when symbols
+        are given, and the columns used by the expression.
+    """
+    referenced = _referenced_columns(" ".join([expression or "", *(columns or [])]))
+    concepts = sorted({concept for concept, _ in referenced})
+
+    if index is None:
+        index = pd.read_parquet(index_path(root), filters=[('concept', 'in', concepts)] if concepts else None)
+    else:
+        index = index[index['concept'].isin(concepts)]
+
+    if symbols is not None:
+        from Functions import resolve_many
+        resolved = {cik: symbol for symbol, cik in resolve_many(symbols).items() if cik is not None}
+        ciks = list(ciks or []) + list(resolved)
+    if ciks is not None:
+        index = index[index['cik'].isin([str(cik).zfill(10) for cik in ciks])]
+
+    wide = index.pivot(index='cik', columns='concept', values=METRICS)
+    wide.columns = [f"{concept}_{metric}" for metric, concept in wide.columns]
+    wide = wide.reindex(columns=[f"{concept}_{metric}" for concept, metric in referenced])
+    names = index.drop_duplicates('cik').set_index('cik')['entityName']
+
+    matches = wide.query(expression) if expression else wide
+    result = pd.concat([names.reindex(matches.index), matches], axis=1)
+    if symbols is not None:
+        result.insert(1, 'symbol', result.index.map(resolved))
+    return result